@@ -0,0 +1,14 @@
+"""Support code for the blog posts. Submodules are only imported on first access."""
+
+import importlib
+
+
+def __getattr__(name: str):
+    try:
+        module = importlib.import_module(f"{__name__}.{name}")
+    except ModuleNotFoundError as e:
+        if e.name != f"{__name__}.{name}":
+            raise
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'") from None
+    globals()[name] = module
+    return module
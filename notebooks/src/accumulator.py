@@ -0,0 +1,118 @@
+"""Streaming sufficient statistics for A/B test estimates, with mergeable partial results."""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Union
+from scipy.stats import norm
+from .balance import group_codes
+
+
+class MomentAccumulator:
+    """Accumulates per-arm cross moments of [1, outcome, covariates] from chunks of data.
+
+    For every arm, the accumulator keeps the matrix sum(v v') with v = [1, y, x1, ..., xp], which contains the
+    number of observations, the sums, the sums of squares and all the cross moments. Accumulators fed with
+    different chunks (in different processes) merge with `+`. Difference in means, CUPED and OLS estimates
+    are computed on demand from the moments, without going back to the data.
+    """
+
+    def __init__(self, y: str, w: str, x: List[str] = []):
+        """Streaming accumulator
+
+        Args:
+            y: outcome variable
+            w: treatment assignment variable
+            x: list of pre-treatment covariates
+        """
+        self.y = y
+        self.w = w
+        self.x = list(x)
+        self.moments: Dict = {}
+
+    def update(self, data: Union[pd.DataFrame, Dict]) -> "MomentAccumulator":
+        """Ingests a chunk of rows, either a dataframe or a mapping from variable names to arrays (or scalars)."""
+        if not isinstance(data, pd.DataFrame):
+            data = pd.DataFrame({k: np.atleast_1d(v) for k, v in data.items()})
+        codes, arms = group_codes(data[self.w])
+        V = np.column_stack([np.ones(len(data)), data[[self.y] + self.x].to_numpy(dtype=float)])
+        for g, arm in enumerate(arms):
+            Vg = V[codes == g]
+            self.moments[arm] = self.moments.get(arm, 0) + Vg.T @ Vg
+        return self
+
+    def __add__(self, other: "MomentAccumulator") -> "MomentAccumulator":
+        """Merges two accumulators of the same variables."""
+        assert (self.y, self.w, self.x) == (other.y, other.w, other.x), "Accumulators refer to different variables."
+        merged = MomentAccumulator(self.y, self.w, self.x)
+        for arm in set(self.moments) | set(other.moments):
+            merged.moments[arm] = self.moments.get(arm, 0) + other.moments.get(arm, 0)
+        return merged
+
+    @property
+    def arms(self) -> list:
+        return sorted(self.moments)
+
+    @property
+    def n(self) -> int:
+        return int(sum(m[0, 0] for m in self.moments.values()))
+
+    def _arm_stats(self, arm):
+        """Number of observations, mean and covariance matrix of [y, x] in one arm."""
+        m = self.moments[arm]
+        n = m[0, 0]
+        mean = m[0, 1:] / n
+        cov = (m[1:, 1:] - n * np.outer(mean, mean)) / (n - 1)
+        return n, mean, cov
+
+    def _contrasts(self, control, weights: np.ndarray) -> pd.DataFrame:
+        """Difference of the means of [y, x] @ weights between every arm and the control arm."""
+        control = self.arms[0] if control is None else control
+        n_c, mean_c, cov_c = self._arm_stats(control)
+        rows = []
+        for arm in self.arms:
+            if arm == control:
+                continue
+            n_t, mean_t, cov_t = self._arm_stats(arm)
+            estimate = (mean_t - mean_c) @ weights
+            std_err = np.sqrt(weights @ cov_t @ weights / n_t + weights @ cov_c @ weights / n_c)
+            rows.append((arm, estimate, std_err, 2 * norm.sf(np.abs(estimate / std_err))))
+        return pd.DataFrame(rows, columns=[self.w, 'estimate', 'std_err', 'p_value']).set_index(self.w)
+
+    def diff_in_means(self, control=None) -> pd.DataFrame:
+        """Difference in means of the outcome between every arm and the control arm."""
+        weights = np.r_[1, np.zeros(len(self.x))]
+        return self._contrasts(control, weights)
+
+    def cuped(self, control=None) -> pd.DataFrame:
+        """CUPED estimates, with the adjustment theta estimated on the pooled data of all arms."""
+        assert self.x, "CUPED needs at least one pre-treatment covariate."
+        m = sum(self.moments.values())
+        n = m[0, 0]
+        mean = m[0, 1:] / n
+        cov = (m[1:, 1:] - n * np.outer(mean, mean)) / (n - 1)
+        theta = np.linalg.solve(cov[1:, 1:], cov[1:, 0])
+        return self._contrasts(control, np.r_[1, -theta])
+
+    def ols(self, control=None) -> pd.DataFrame:
+        """OLS regression of the outcome on arm dummies and covariates, with homoskedastic standard errors."""
+        control = self.arms[0] if control is None else control
+        treated = [arm for arm in self.arms if arm != control]
+        p = len(self.x)
+        k = 1 + len(treated) + p
+        ZZ, Zy, yy = np.zeros((k, k)), np.zeros(k), 0
+        for arm, m in self.moments.items():
+            # Map v = [1, y, x] of this arm into z = [1, dummies, x]
+            T = np.zeros((k, 2 + p))
+            T[0, 0] = 1
+            if arm != control:
+                T[1 + treated.index(arm), 0] = 1
+            T[1 + len(treated):, 2:] = np.eye(p)
+            ZZ += T @ m @ T.T
+            Zy += T @ m[:, 1]
+            yy += m[1, 1]
+        beta = np.linalg.solve(ZZ, Zy)
+        sigma2 = (yy - beta @ Zy) / (self.n - k)
+        std_err = np.sqrt(sigma2 * np.diag(np.linalg.inv(ZZ)))
+        names = ['Intercept'] + [f"{self.w}[{arm}]" for arm in treated] + self.x
+        return pd.DataFrame({'coef': beta, 'std_err': std_err, 'p_value': 2 * norm.sf(np.abs(beta / std_err))},
+                            index=names)
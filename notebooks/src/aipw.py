@@ -0,0 +1,86 @@
+"""IPW, Hajek and AIPW estimators, broadcast over many simulated draws."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from scipy.stats import norm
+
+
+def _mean(x: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """Mean over the last axis of the kept observations, ignoring the values of the dropped ones."""
+    return np.where(keep, x, 0).sum(-1) / keep.sum(-1)
+
+
+def ate_estimates(y: np.ndarray,
+                  d: np.ndarray,
+                  e: np.ndarray,
+                  mu0: np.ndarray = None,
+                  mu1: np.ndarray = None,
+                  trims: List[float] = [0],
+                  method: str = 'clip',
+                  ) -> pd.DataFrame:
+    """IPW, Hajek and AIPW estimates of the average treatment effect, for every draw and trimming level.
+
+    All inputs are stacked as (draws, n) arrays and trimming levels are an extra leading axis, so that all
+    estimates and their influence-function standard errors come from one broadcast computation.
+
+    Args:
+        y: (draws, n) outcomes
+        d: (draws, n) treatment assignments
+        e: (draws, n) propensity scores
+        mu0: (draws, n) predictions of the outcome under control, AIPW is skipped if missing
+        mu1: (draws, n) predictions of the outcome under treatment
+        trims: list of trimming levels t
+        method: 'clip' to clip propensity scores to [t, 1-t], 'drop' to drop observations outside [t, 1-t]
+
+    Returns:
+        tidy dataframe with columns draw, estimator, trim, estimate and std_err
+    """
+    y, d, e = np.atleast_2d(y).astype(float), np.atleast_2d(d).astype(float), np.atleast_2d(e).astype(float)
+    t = np.asarray(trims, dtype=float)[:, None, None]
+    if method == 'drop':
+        keep = ((e >= t) & (e <= 1 - t)).astype(float)
+        # Neutral propensity score on dropped observations, whose weights would be infinite at e = 0 or 1
+        e = np.where(keep, e, 0.5)
+    else:
+        keep = np.ones((len(t),) + e.shape)
+        e = np.clip(e, t, 1 - t)
+    w1, w0 = d / e, (1 - d) / (1 - e)
+
+    # Horvitz-Thompson IPW
+    psi = w1 * y - w0 * y
+    estimates = {'ipw': _mean(psi, keep)}
+    ifs = {'ipw': psi - estimates['ipw'][..., None]}
+
+    # Hajek, with normalized weights
+    m1, m0 = _mean(w1 * y, keep) / _mean(w1, keep), _mean(w0 * y, keep) / _mean(w0, keep)
+    estimates['hajek'] = m1 - m0
+    ifs['hajek'] = w1 * (y - m1[..., None]) / _mean(w1, keep)[..., None] \
+        - w0 * (y - m0[..., None]) / _mean(w0, keep)[..., None]
+
+    # AIPW
+    if mu0 is not None:
+        mu0, mu1 = np.atleast_2d(mu0), np.atleast_2d(mu1)
+        psi = mu1 - mu0 + w1 * (y - mu1) - w0 * (y - mu0)
+        estimates['aipw'] = _mean(psi, keep)
+        ifs['aipw'] = psi - estimates['aipw'][..., None]
+
+    # Assemble table
+    n = keep.sum(-1)
+    T, D = n.shape
+    tables = []
+    for name, estimate in estimates.items():
+        std_err = np.sqrt(_mean(ifs[name]**2, keep) / n)
+        tables.append(pd.DataFrame({'draw': np.tile(np.arange(D), T), 'estimator': name,
+                                    'trim': np.repeat(trims, D), 'estimate': estimate.ravel(),
+                                    'std_err': std_err.ravel()}))
+    return pd.concat(tables, ignore_index=True)
+
+
+def coverage(table: pd.DataFrame, truth: float, alpha: float = 0.05) -> pd.DataFrame:
+    """Bias, standard deviation, mean standard error and confidence interval coverage by estimator and trim."""
+    z = norm.ppf(1 - alpha / 2)
+    covered = (np.abs(table['estimate'] - truth) <= z * table['std_err'])
+    return table.assign(bias=table['estimate'] - truth, covered=covered)\
+        .groupby(['estimator', 'trim'])\
+        .agg(bias=('bias', 'mean'), std=('estimate', 'std'), std_err=('std_err', 'mean'), coverage=('covered', 'mean'))
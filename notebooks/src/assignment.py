@@ -0,0 +1,172 @@
+"""Treatment assignment by rerandomization, with stratified and blocked designs."""
+
+import numpy as np
+import pandas as pd
+from typing import Tuple
+from scipy.stats import chi2
+from .dgp import DGP
+
+
+def make_blocks(x: np.ndarray, block_size: int) -> np.ndarray:
+    """Block codes from sorting units on x and grouping consecutive units in blocks of block_size."""
+    ranks = np.empty(len(x), dtype=np.int64)
+    ranks[np.argsort(x, kind='stable')] = np.arange(len(x))
+    return ranks // block_size
+
+
+def draw_assignments(strata: np.ndarray, n_treated: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Draws size candidate assignments, completely randomized within strata.
+
+    Every candidate is a random permutation of the units that keeps them sorted by stratum, so that the
+    first n_treated[s] units of stratum s are treated. All candidates are drawn with one argsort.
+
+    Args:
+        strata: stratum codes in [0, S), one per unit
+        n_treated: number of treated units in each stratum
+        size: number of candidates
+        rng: random generator
+
+    Returns:
+        (size, n) boolean matrix of assignments
+    """
+    n = len(strata)
+    strata_sorted = np.sort(strata)
+    starts = np.searchsorted(strata_sorted, np.arange(len(n_treated)))
+    treated_sorted = (np.arange(n) - starts[strata_sorted]) < n_treated[strata_sorted]
+    perm = np.argsort(strata[None, :] + rng.random((size, n)), axis=1)
+    W = np.empty((size, n), dtype=bool)
+    np.put_along_axis(W, perm, np.broadcast_to(treated_sorted, (size, n)), axis=1)
+    return W
+
+
+def design_covariance(X: np.ndarray, strata: np.ndarray, n_treated: np.ndarray) -> np.ndarray:
+    """Covariance of the treated covariate sums under complete randomization within strata.
+
+    Every stratum s draws n_treated[s] of its n_s units without replacement, so that it contributes
+    n1_s n0_s / (n_s (n_s - 1)) times the sum of squared deviations from its own mean. Stratified and blocked
+    designs thus have a smaller covariance than complete randomization.
+
+    Args:
+        X: (n, p) matrix of covariates
+        strata: stratum codes in [0, S), one per unit
+        n_treated: number of treated units in each stratum
+
+    Returns:
+        (p, p) covariance matrix
+    """
+    X = np.asarray(X, dtype=float).reshape(len(strata), -1)
+    n_s = np.bincount(strata, minlength=len(n_treated))
+    means = np.stack([np.bincount(strata, weights=x, minlength=len(n_s)) for x in X.T], axis=1) / np.maximum(n_s, 1)[:, None]
+    dev = X - means[strata]
+    weights = n_treated * (n_s - n_treated) / np.maximum(n_s * (n_s - 1), 1)
+    return (dev * weights[strata][:, None]).T @ dev
+
+
+def mahalanobis_distance(W: np.ndarray, X: np.ndarray, strata: np.ndarray = None) -> np.ndarray:
+    """Mahalanobis distance between treated and control covariate means, for every candidate assignment.
+
+    The distance uses the covariance of the difference in means under the design, complete randomization
+    within strata, and measures the imbalance with respect to its expected value under the design (zero when
+    all strata have the same share of treated units).
+
+    Args:
+        W: (B, n) matrix of candidate assignments with the same number of treated units in each stratum
+        X: (n, p) matrix of covariates
+        strata: stratum codes in [0, S), by default complete randomization
+
+    Returns:
+        array of B distances, distributed approximately as chi-squared with rank(covariance) degrees of freedom
+    """
+    X = np.asarray(X, dtype=float).reshape(W.shape[1], -1)
+    strata = np.zeros(len(X), dtype=np.int64) if strata is None else strata
+    n_treated = np.bincount(strata, weights=W[0]).astype(np.int64)
+    # Up to the factor 1/n1 + 1/n0, the difference in means is the treated sum of the covariates centered by stratum
+    n_s = np.bincount(strata)
+    means = np.stack([np.bincount(strata, weights=x) for x in X.T], axis=1) / np.maximum(n_s, 1)[:, None]
+    Z = W @ (X - means[strata])
+    # Pseudo-inverse, since stratifying on a covariate removes its variance
+    return np.einsum('bi,ij,bj->b', Z, np.linalg.pinv(design_covariance(X, strata, n_treated), hermitian=True), Z)
+
+
+def rerandomize(X: np.ndarray,
+                p: float = 0.5,
+                threshold: float = None,
+                acceptance: float = 0.01,
+                strata: np.ndarray = None,
+                n_calibration: int = None,
+                max_draws: int = 100_000,
+                batch_size: int = 1_000,
+                seed: int = 0,
+                ) -> Tuple[np.ndarray, float, int]:
+    """Draws treatment assignments in batches until the covariate balance is below a threshold.
+
+    Args:
+        X: (n, p) matrix of covariates
+        p: share of treated units (within each stratum)
+        threshold: maximum Mahalanobis distance of an accepted assignment
+        acceptance: if threshold is None, the threshold is the acceptance quantile of the distance, either its
+            empirical quantile on n_calibration candidates or the quantile of the chi-squared distribution with as
+            many degrees of freedom as the rank of the design covariance
+        strata: stratum (or block) of each unit, by default complete randomization
+        n_calibration: number of candidates to calibrate the threshold on, by default 100 / acceptance with strata
+            (with small strata or blocks, distances are far from chi-squared) and none without
+        max_draws: maximum number of candidate assignments
+        batch_size: number of candidate assignments drawn and scored together
+        seed: random seed
+
+    Returns:
+        accepted assignment, its Mahalanobis distance and the number of candidates drawn
+    """
+    X = np.asarray(X, dtype=float).reshape(len(X), -1)
+    codes = np.zeros(len(X), dtype=np.int64) if strata is None else pd.factorize(np.asarray(strata))[0]
+    n_treated = np.rint(p * np.bincount(codes)).astype(np.int64)
+    if n_calibration is None:
+        n_calibration = 0 if strata is None else int(np.ceil(100 / acceptance))
+    if threshold is None and n_calibration > 0:
+        rng = np.random.default_rng([seed, 1])
+        distances = [mahalanobis_distance(draw_assignments(codes, n_treated, min(batch_size, n_calibration - b), rng), X, codes)
+                     for b in range(0, n_calibration, batch_size)]
+        threshold = np.quantile(np.concatenate(distances), acceptance)
+    elif threshold is None:
+        threshold = chi2.ppf(acceptance, np.linalg.matrix_rank(design_covariance(X, codes, n_treated), hermitian=True))
+    rng = np.random.default_rng(seed)
+    draws = 0
+    while draws < max_draws:
+        size = min(batch_size, max_draws - draws)
+        W = draw_assignments(codes, n_treated, size, rng)
+        distance = mahalanobis_distance(W, X, codes)
+        accepted = np.flatnonzero(distance <= threshold)
+        if len(accepted):
+            return W[accepted[0]].astype(int), distance[accepted[0]], draws + accepted[0] + 1
+        draws += size
+    raise RuntimeError(f"No assignment with distance below {threshold:.4f} in {max_draws} draws.")
+
+
+class RerandomizedDGP(DGP):
+    """DGP whose treatment is assigned by rerandomization on the observable variables.
+
+    Subclasses implement initialize_data and add_potential_outcomes, and can set the class attributes below
+    to choose the design: complete randomization by default, stratified on the `strata` variable, or blocked
+    in groups of `block_size` units sorted on the `block_on` variable. With strata or blocks, the acceptance
+    threshold is calibrated on `n_calibration` candidates (by default 100 / acceptance).
+    """
+    p: float = 0.5
+    acceptance: float = 0.01
+    strata: str = None
+    block_on: str = None
+    block_size: int = 2
+    n_calibration: int = None
+    max_draws: int = 100_000
+    batch_size: int = 1_000
+
+    def add_treatment_assignment(self, df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+        """Adds the treatment assignment variable, rerandomizing until the observables are balanced."""
+        strata = None
+        if self.strata is not None:
+            strata = df[self.strata].to_numpy()
+        elif self.block_on is not None:
+            strata = make_blocks(df[self.block_on].to_numpy(), self.block_size)
+        df[self.w], self.distance, self.n_candidates = rerandomize(
+            df[self.x].to_numpy(dtype=float), p=self.p, acceptance=self.acceptance, strata=strata,
+            n_calibration=self.n_calibration, max_draws=self.max_draws, batch_size=self.batch_size, seed=seed)
+        return df
@@ -0,0 +1,142 @@
+"""Balance tables for randomized assignments, computed in one grouped pass."""
+
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+from scipy.stats import t, f, chi2
+
+
+def group_codes(x) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer codes and sorted levels of a grouping variable. Missing values get code -1."""
+    if isinstance(x, pd.Series) and isinstance(x.dtype, pd.CategoricalDtype):
+        return x.cat.codes.to_numpy(), x.cat.categories.to_numpy()
+    codes, levels = pd.factorize(np.asarray(x), sort=True)
+    return codes, np.asarray(levels)
+
+
+def group_moments(codes: np.ndarray, X: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-group counts, means and variances of the columns of X.
+
+    Args:
+        codes: group codes in [0, n_groups), one per row (rows with code -1 are ignored)
+        X: (n, p) matrix of covariates, missing values as NaN
+        n_groups: number of groups
+
+    Returns:
+        counts, means and (unbiased) variances, each of shape (n_groups, p)
+    """
+    X = np.asarray(X, dtype=float).reshape(len(codes), -1)
+    keep = codes >= 0
+    if not keep.all():
+        codes, X = codes[keep], X[keep]
+    p = X.shape[1]
+    counts = np.empty((n_groups, p))
+    sums = np.empty((n_groups, p))
+    sums2 = np.empty((n_groups, p))
+    for j in range(p):
+        x = X[:, j]
+        valid = ~np.isnan(x)
+        x = np.where(valid, x, 0)
+        counts[:, j] = np.bincount(codes, weights=valid, minlength=n_groups)
+        sums[:, j] = np.bincount(codes, weights=x, minlength=n_groups)
+        sums2[:, j] = np.bincount(codes, weights=x**2, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        variances = np.maximum(sums2 - counts * means**2, 0) / (counts - 1)
+    return counts, means, variances
+
+
+def _numeric_pvalues(counts: np.ndarray, means: np.ndarray, variances: np.ndarray) -> np.ndarray:
+    """Welch t-test p-values for two groups, one-way ANOVA F-test p-values for more."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if len(counts) == 2:
+            s2 = variances / counts
+            stat = (means[1] - means[0]) / np.sqrt(s2.sum(0))
+            dof = s2.sum(0)**2 / (s2[0]**2 / (counts[0] - 1) + s2[1]**2 / (counts[1] - 1))
+            return 2 * t.sf(np.abs(stat), dof)
+        n = counts.sum(0)
+        k = (counts > 0).sum(0)
+        grand_mean = (counts * means).sum(0) / n
+        ss_between = np.nansum(counts * (means - grand_mean)**2, axis=0)
+        ss_within = np.nansum((counts - 1) * variances, axis=0)
+        stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+        return f.sf(stat, k - 1, n - k)
+
+
+def _smd(means: np.ndarray, variances: np.ndarray, ref: int) -> np.ndarray:
+    """Standardized mean differences of every group against the reference group."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (means - means[ref]) / np.sqrt((variances + variances[ref]) / 2)
+
+
+def balance_table(df: pd.DataFrame,
+                  group: str,
+                  covariates: List[str],
+                  categorical: List[str] = None,
+                  reference=None,
+                  ) -> pd.DataFrame:
+    """Balance table of covariates across treatment groups (a fast create_table_one).
+
+    Numeric covariates get per-group means and standard deviations, the standardized mean difference of
+    each group against the reference group, and a Welch t-test (two groups) or F-test (more groups) p-value.
+    Categorical covariates get one row per level, with the level share as mean and a chi-squared test of
+    independence p-value on the first row of the variable. The first row reports the group sizes.
+
+    Args:
+        df: dataframe
+        group: name of the group (treatment assignment) variable, rows with missing group are dropped
+        covariates: list of covariate names
+        categorical: list of categorical covariates, by default non-numeric covariates are categorical
+        reference: reference group for standardized differences, by default the first level
+
+    Returns:
+        dataframe with one row per (covariate, level) and columns mean_<g>, sd_<g>, smd_<g> and p_value
+    """
+    codes, groups = group_codes(df[group])
+    G = len(groups)
+    ref = 0 if reference is None else int(np.flatnonzero(groups == reference)[0])
+    if categorical is None:
+        categorical = [c for c in covariates if not pd.api.types.is_numeric_dtype(df[c])]
+    numeric = [c for c in covariates if c not in categorical]
+    others = [g for g in range(G) if g != ref]
+    n = np.bincount(codes[codes >= 0], minlength=G).astype(float)
+
+    # Numeric covariates, one bincount pass per column
+    blocks = []
+    if numeric:
+        counts, means, variances = group_moments(codes, df[numeric].to_numpy(dtype=float), G)
+        blocks.append((numeric, means, np.sqrt(variances), _smd(means, variances, ref),
+                       _numeric_pvalues(counts, means, variances)))
+
+    # Categorical covariates, one bincount over combined (group, level) codes
+    for c in categorical:
+        levels_codes, levels = group_codes(df[c])
+        L = len(levels)
+        keep = (codes >= 0) & (levels_codes >= 0)
+        table = np.bincount(codes[keep] * L + levels_codes[keep], minlength=G * L).reshape(G, L)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shares = table / table.sum(1, keepdims=True)
+            expected = table.sum(1, keepdims=True) * table.sum(0, keepdims=True) / table.sum()
+            used = table.sum(0) > 0
+            stat = ((table - expected)[:, used]**2 / expected[:, used]).sum()
+        dof = ((table.sum(1) > 0).sum() - 1) * (used.sum() - 1)
+        pvalues = np.full(L, np.nan)
+        pvalues[0] = chi2.sf(stat, dof) if dof > 0 else np.nan
+        variances = shares * (1 - shares)
+        blocks.append(([f"{c} = {l}" for l in levels], shares, np.sqrt(variances),
+                       _smd(shares, variances, ref), pvalues))
+
+    # Assemble table
+    index = ['n'] + [name for b in blocks for name in b[0]]
+    empty = np.full((G, 1), np.nan)
+    means = np.column_stack([n[:, None]] + [b[1] for b in blocks])
+    sds = np.column_stack([empty] + [b[2] for b in blocks])
+    smds = np.column_stack([empty] + [b[3] for b in blocks])
+    table = {}
+    for g, name in enumerate(groups):
+        table[f"mean_{name}"] = means[g]
+        table[f"sd_{name}"] = sds[g]
+    for g in others:
+        table[f"smd_{groups[g]}"] = smds[g]
+    table['p_value'] = np.concatenate([[np.nan]] + [b[4] for b in blocks])
+    return pd.DataFrame(table, index=pd.Index(index, name='variable'))
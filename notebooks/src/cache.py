@@ -0,0 +1,201 @@
+"""Content-addressed on-disk cache of generated datasets."""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Version of the storage format, part of every key so that entries in older formats are never read
+FORMAT = 2
+
+
+def _param_repr(value) -> str:
+    """Stable representation of a parameter, hashing the content of arrays."""
+    if isinstance(value, np.ndarray):
+        return f"ndarray{value.shape}{value.dtype}:{hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()}"
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return f"{type(value).__name__}:{hashlib.sha256(pd.util.hash_pandas_object(value).values.tobytes()).hexdigest()}"
+    return repr(value)
+
+
+def source_hash(cls: type) -> str:
+    """Hash of the source of the modules defining cls and its base classes, so that any change invalidates the cache."""
+    h = hashlib.sha256()
+    for base in cls.__mro__:
+        module = sys.modules.get(base.__module__)
+        try:
+            h.update(inspect.getsource(module if module is not None and base.__module__ != '__main__' else base).encode())
+        except (OSError, TypeError):
+            h.update(base.__qualname__.encode())
+    return h.hexdigest()
+
+
+def dataset_key(dgp, method: str, kwargs: dict) -> str:
+    """Key of a dataset: DGP class, instance parameters, call arguments (with defaults, seeds included) and source."""
+    bound = inspect.signature(getattr(dgp, method)).bind(**kwargs)
+    bound.apply_defaults()
+    content = {
+        'class': f"{type(dgp).__module__}.{type(dgp).__qualname__}",
+        'method': method,
+        'params': {k: _param_repr(v) for k, v in sorted(vars(dgp).items())},
+        'arguments': {k: _param_repr(v) for k, v in sorted(bound.arguments.items())},
+        'source': source_hash(type(dgp)),
+        'format': FORMAT,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def _frame_arrays(df: pd.DataFrame):
+    """Column descriptions and arrays of a dataframe: one array per column, codes and categories for categoricals,
+    and the index values unless it is a range index."""
+    columns, arrays = [], []
+    for name, col in zip(df.columns.tolist(), (df.iloc[:, i] for i in range(df.shape[1]))):
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            columns.append({'name': name, 'categorical': True, 'ordered': bool(col.cat.ordered)})
+            arrays += [col.cat.codes.to_numpy(), col.cat.categories.to_numpy()]
+        else:
+            columns.append({'name': name, 'categorical': False})
+            arrays.append(col.to_numpy())
+    index = df.index
+    if isinstance(index, pd.RangeIndex):
+        index_meta = {'name': index.name, 'range': [index.start, index.stop, index.step]}
+    else:
+        index_meta = {'name': index.name, 'range': None}
+        arrays.append(index.to_numpy())
+    return {'columns': columns, 'index': index_meta}, arrays
+
+
+def _frame(meta: dict, arrays: list) -> pd.DataFrame:
+    """Dataframe from the arrays of _frame_arrays, without copying the memory-mapped columns."""
+    arrays, values = iter(arrays), []
+    for col in meta['columns']:
+        if col['categorical']:
+            values.append(pd.Categorical.from_codes(next(arrays), categories=next(arrays), ordered=col['ordered']))
+        else:
+            values.append(next(arrays))
+    index_meta = meta['index']
+    index = pd.RangeIndex(*index_meta['range']) if index_meta['range'] is not None else pd.Index(next(arrays))
+    index.name = index_meta['name']
+    df = pd.DataFrame(dict(enumerate(values)), index=index, copy=False)
+    df.columns = [col['name'] for col in meta['columns']]
+    return df
+
+
+class DatasetCache:
+    """Persistent cache of DGP outputs, read back by memory-mapping instead of regenerating them.
+
+    Every dataset is stored in its own directory named by its key, as one .npy file per array: dataframes
+    column by column (categoricals as codes and categories), and dictionaries or tuples element by element.
+    Arrays are read back as copy-on-write memory maps, except object arrays (e.g. string columns) which are loaded:
+    cached outputs can be edited in place like generated ones, the edits staying private to the process.
+    Entries are written to a temporary directory and renamed into place, so that concurrent writers never
+    expose partial entries and the first complete entry wins. Reads refresh the entry modification time, and
+    the least recently used entries are evicted when the cache exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: float = 10e9):
+        """Cache setup
+
+        Args:
+            directory: cache directory, by default $BLOG_POSTS_CACHE or ~/.cache/blog-posts
+            max_bytes: maximum total size of the cache
+        """
+        default = os.environ.get('BLOG_POSTS_CACHE', os.path.join('~', '.cache', 'blog-posts'))
+        self.directory = os.path.expanduser(directory or default)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def generate(self, dgp, method: str = 'generate_data', **kwargs):
+        """Output of dgp.method(**kwargs), from the cache if available, otherwise generated and stored."""
+        path = os.path.join(self.directory, dataset_key(dgp, method, kwargs))
+        out = self._read(path)
+        if out is None:
+            out = getattr(dgp, method)(**kwargs)
+            self._write(path, out)
+            self.evict()
+        return out
+
+    def _read(self, path: str):
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            os.utime(path)
+            arrays = [np.load(os.path.join(path, name), mmap_mode=None if obj else 'c', allow_pickle=obj)
+                      for name, obj in zip(meta['files'], meta['objects'])]
+        except OSError:
+            # Missing entry, or entry evicted during the read
+            return None
+        if meta['type'] == 'DataFrame':
+            return _frame(meta, arrays)
+        if meta['type'] == 'ndarray':
+            return arrays[0]
+        if meta['type'] == 'dict':
+            return dict(zip(meta['keys'], arrays))
+        return tuple(arrays)
+
+    def _write(self, path: str, out):
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            if isinstance(out, pd.DataFrame):
+                meta, arrays = _frame_arrays(out)
+                meta['type'] = 'DataFrame'
+            elif isinstance(out, dict):
+                meta, arrays = {'type': 'dict', 'keys': list(out)}, list(out.values())
+            elif isinstance(out, tuple):
+                meta, arrays = {'type': 'tuple'}, list(out)
+            else:
+                meta, arrays = {'type': 'ndarray'}, [out]
+            arrays = [np.asarray(array) for array in arrays]
+            meta['files'] = [f"{i}.npy" for i in range(len(arrays))]
+            meta['objects'] = [array.dtype.hasobject for array in arrays]
+            for file, array in zip(meta['files'], arrays):
+                np.save(os.path.join(tmp, file), array)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            os.rename(tmp, path)
+        except OSError:
+            # Another process stored the same entry first
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def entries(self) -> pd.DataFrame:
+        """Cached entries with their size and last access time, most recent first."""
+        rows = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            try:
+                rows.append({'key': name, 'bytes': _dir_size(path), 'last_access': os.path.getmtime(path)})
+            except FileNotFoundError:
+                continue
+        df = pd.DataFrame(rows, columns=['key', 'bytes', 'last_access'])
+        return df.sort_values('last_access', ascending=False, ignore_index=True)
+
+    def evict(self, max_bytes: float = None):
+        """Removes the least recently used entries until the cache fits in max_bytes, and stale temporary files."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        over = entries['bytes'].cumsum() > max_bytes
+        for key in entries.loc[over, 'key']:
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.tmp-') and time.time() - os.path.getmtime(path) > 3600:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        """Removes every entry."""
+        self.evict(max_bytes=-1)
@@ -0,0 +1,122 @@
+"""Distribution comparison tests for many metrics and treatment arms at once."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from itertools import combinations
+from scipy.stats import t, f, chi2, norm, kstwo
+from .balance import group_codes, group_moments
+
+
+def _runs(x_sorted: np.ndarray):
+    """Starts and lengths of the runs of tied values in a sorted array."""
+    starts = np.flatnonzero(np.r_[True, x_sorted[1:] != x_sorted[:-1]])
+    return starts, np.diff(np.r_[starts, len(x_sorted)])
+
+
+def _rank_tests(x_sorted: np.ndarray, is_a: np.ndarray):
+    """Mann-Whitney and Kolmogorov-Smirnov tests of sample a against sample b, from the pooled sorted values.
+
+    Both tests share the runs of tied values: average ranks for Mann-Whitney, ends of runs for the ECDFs.
+    """
+    n = len(x_sorted)
+    n_a = is_a.sum()
+    n_b = n - n_a
+    starts, lengths = _runs(x_sorted)
+
+    # Mann-Whitney U of sample a, normal approximation with tie and continuity correction
+    ranks = np.repeat(starts + (lengths + 1) / 2, lengths)
+    u = ranks[is_a].sum() - n_a * (n_a + 1) / 2
+    mu = n_a * n_b / 2
+    sigma = np.sqrt(n_a * n_b / 12 * ((n + 1) - (lengths**3 - lengths).sum() / (n * (n - 1))))
+    z = (np.abs(u - mu) - 0.5) / sigma
+    p_mw = min(1, 2 * norm.sf(z))
+
+    # Kolmogorov-Smirnov, ECDFs evaluated at the end of each run of ties
+    ends = starts + lengths - 1
+    cdf_a = np.cumsum(is_a)[ends] / n_a
+    cdf_b = np.cumsum(~is_a)[ends] / n_b
+    d = np.abs(cdf_a - cdf_b).max()
+    p_ks = kstwo.sf(d, np.round(n_a * n_b / n))
+
+    return (u, p_mw), (d, min(1, p_ks))
+
+
+def _chisquared_test(ref_sorted: np.ndarray, x_sorted: np.ndarray, n_bins: int):
+    """Chi-squared test of the frequencies of x in the quantile bins of the reference sample."""
+    edges = np.unique(np.quantile(ref_sorted, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    observed_ref = np.diff(np.r_[0, np.searchsorted(ref_sorted, edges, side='right'), len(ref_sorted)])
+    observed = np.diff(np.r_[0, np.searchsorted(x_sorted, edges, side='right'), len(x_sorted)])
+    expected = observed_ref / len(ref_sorted) * len(x_sorted)
+    used = expected > 0
+    stat = ((observed[used] - expected[used])**2 / expected[used]).sum()
+    return stat, chi2.sf(stat, used.sum() - 1)
+
+
+def compare_groups(df: pd.DataFrame,
+                   group: str,
+                   metrics: List[str],
+                   reference=None,
+                   pairs: str = 'all',
+                   n_bins: int = 10,
+                   ) -> pd.DataFrame:
+    """Compares the distribution of many metrics across many groups.
+
+    For every metric and every pair of groups, runs a t-test, a Mann–Whitney U test, a Kolmogorov-Smirnov test
+    and a chi-squared test on the quantile bins of the second group. For every metric, runs an F-test across
+    all groups. Each metric is sorted once, and all pairwise tests read from the same sorted values.
+
+    Args:
+        df: dataframe
+        group: name of the group variable, rows with missing group are dropped
+        metrics: list of metric names
+        reference: reference group, by default the first level
+        pairs: 'all' for all pairs of groups, 'reference' for every group against the reference group
+        n_bins: number of quantile bins for the chi-squared test
+
+    Returns:
+        tidy dataframe with columns metric, group, reference, test, statistic and p_value
+    """
+    codes, groups = group_codes(df[group])
+    G = len(groups)
+    ref = 0 if reference is None else int(np.flatnonzero(groups == reference)[0])
+    if pairs == 'reference':
+        pair_list = [(g, ref) for g in range(G) if g != ref]
+    else:
+        pair_list = [(b, a) for a, b in combinations(range(G), 2)]
+    X = df[metrics].to_numpy(dtype=float)
+    counts, means, variances = group_moments(codes, X, G)
+
+    rows = []
+    for j, metric in enumerate(metrics):
+        x = X[:, j]
+        keep = (codes >= 0) & ~np.isnan(x)
+        order = np.argsort(x[keep], kind='stable')
+        x_sorted = x[keep][order]
+        codes_sorted = codes[keep][order]
+        in_group = [codes_sorted == g for g in range(G)]
+
+        # Pairwise tests
+        for a, b in pair_list:
+            n_a, n_b = counts[a, j], counts[b, j]
+            dof = n_a + n_b - 2
+            pooled = ((n_a - 1) * variances[a, j] + (n_b - 1) * variances[b, j]) / dof
+            t_stat = (means[a, j] - means[b, j]) / np.sqrt(pooled * (1 / n_a + 1 / n_b))
+            pair = in_group[a] | in_group[b]
+            (u, p_mw), (d, p_ks) = _rank_tests(x_sorted[pair], in_group[a][pair])
+            c_stat, p_chi = _chisquared_test(x_sorted[in_group[b]], x_sorted[in_group[a]], n_bins)
+            for test, stat, p in [('t-test', t_stat, 2 * t.sf(np.abs(t_stat), dof)),
+                                  ('mann-whitney', u, p_mw),
+                                  ('kolmogorov-smirnov', d, p_ks),
+                                  ('chi-squared', c_stat, p_chi)]:
+                rows.append((metric, groups[a], groups[b], test, stat, p))
+
+        # F-test across all groups
+        n, k = counts[:, j].sum(), (counts[:, j] > 0).sum()
+        grand_mean = (counts[:, j] * means[:, j]).sum() / n
+        ss_between = np.nansum(counts[:, j] * (means[:, j] - grand_mean)**2)
+        ss_within = np.nansum((counts[:, j] - 1) * variances[:, j])
+        f_stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+        rows.append((metric, 'all', None, 'f-test', f_stat, f.sf(f_stat, k - 1, n - k)))
+
+    return pd.DataFrame(rows, columns=['metric', 'group', 'reference', 'test', 'statistic', 'p_value'])
@@ -0,0 +1,111 @@
+"""Cross-fitted nuisance models for double machine learning and AIPW estimators."""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+from scipy.stats import norm
+
+
+def fingerprint(*arrays) -> str:
+    """Hash of the content, shape and type of a list of arrays."""
+    h = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f"{a.shape}{a.dtype}".encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def model_key(model) -> str:
+    """Identifier of an (unfitted) sklearn model and its parameters."""
+    return f"{type(model).__name__}{sorted(model.get_params().items(), key=str)}"
+
+
+def _fit_predict(model, X_train: np.ndarray, y_train: np.ndarray, X_test: np.ndarray, proba: bool) -> np.ndarray:
+    """Fits the model on the training fold and predicts on the test fold."""
+    model.fit(X_train, y_train)
+    return model.predict_proba(X_test)[:, 1] if proba else model.predict(X_test)
+
+
+class CrossFitter:
+    """Out-of-fold predictions of the nuisance functions of DML and AIPW estimators.
+
+    The nuisances are the outcome regression E[y|X] (partially linear model), the outcome regressions
+    E[y|X, d=0] and E[y|X, d=1] (AIPW) and the propensity score E[d|X]. Each final stage only requests the
+    nuisances it needs, and all their fold x nuisance fits are dispatched to a joblib process pool. Predictions
+    are cached by data fingerprint, fold split and model, so that different final stages on the same data do not
+    refit any nuisance model.
+    """
+
+    def __init__(self, model_y, model_d, n_folds: int = 5, seed: int = 0, n_jobs: int = -1):
+        """Cross-fitting setup
+
+        Args:
+            model_y: sklearn regressor for the outcome
+            model_d: sklearn classifier for the treatment
+            n_folds: number of cross-fitting folds
+            seed: random seed of the fold split
+            n_jobs: number of parallel jobs
+        """
+        self.model_y = model_y
+        self.model_d = model_d
+        self.n_folds = n_folds
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.cache: Dict[tuple, np.ndarray] = {}
+
+    def nuisances(self, X: np.ndarray, y: np.ndarray, d: np.ndarray,
+                  names: Tuple[str, ...] = ('l', 'mu0', 'mu1', 'e')) -> Dict[str, np.ndarray]:
+        """Out-of-fold predictions of the nuisances in names, among l = E[y|X], mu0 = E[y|X,d=0], mu1 = E[y|X,d=1]
+        and e = E[d|X]. Only the nuisances that are not cached yet are fitted."""
+        X, y, d = np.asarray(X, dtype=float), np.asarray(y, dtype=float), np.asarray(d).astype(int)
+        data_key = (fingerprint(X, y, d), self.n_folds, self.seed)
+        specs = {'l': (self.model_y, y, None, False), 'mu0': (self.model_y, y, 0, False),
+                 'mu1': (self.model_y, y, 1, False), 'e': (self.model_d, d, None, True)}
+        specs = {name: specs[name] for name in names}
+        keys = {name: data_key + (name, model_key(spec[0])) for name, spec in specs.items()}
+        missing = [name for name in specs if keys[name] not in self.cache]
+
+        if missing:
+            folds = list(KFold(self.n_folds, shuffle=True, random_state=self.seed).split(X))
+            tasks = []
+            for name in missing:
+                model, target, arm, proba = specs[name]
+                for train, test in folds:
+                    if arm is not None:
+                        train = train[d[train] == arm]
+                    tasks.append((name, test, delayed(_fit_predict)(clone(model), X[train], target[train], X[test], proba)))
+            predictions = Parallel(n_jobs=self.n_jobs)(task for _, _, task in tasks)
+            for name in missing:
+                self.cache[keys[name]] = np.empty(len(y))
+            for (name, test, _), prediction in zip(tasks, predictions):
+                self.cache[keys[name]][test] = prediction
+
+        return {name: self.cache[keys[name]] for name in specs}
+
+    def plr(self, X: np.ndarray, y: np.ndarray, d: np.ndarray) -> pd.Series:
+        """Partially linear model (Chernozhukov et al., 2018): regression of y - l(X) on d - e(X)."""
+        nuisances = self.nuisances(X, y, d, names=('l', 'e'))
+        y_res = np.asarray(y, dtype=float) - nuisances['l']
+        d_res = np.asarray(d, dtype=float) - nuisances['e']
+        theta = (y_res @ d_res) / (d_res @ d_res)
+        psi = (y_res - theta * d_res) * d_res / np.mean(d_res**2)
+        return self._summary(theta, psi)
+
+    def aipw(self, X: np.ndarray, y: np.ndarray, d: np.ndarray, trim: float = 0) -> pd.Series:
+        """Augmented inverse probability weighting estimate of the ATE, with propensity scores clipped to [trim, 1-trim]."""
+        nuisances = self.nuisances(X, y, d, names=('mu0', 'mu1', 'e'))
+        y, d = np.asarray(y, dtype=float), np.asarray(d, dtype=float)
+        mu0, mu1, e = nuisances['mu0'], nuisances['mu1'], np.clip(nuisances['e'], trim, 1 - trim)
+        psi = mu1 - mu0 + d / e * (y - mu1) - (1 - d) / (1 - e) * (y - mu0)
+        return self._summary(psi.mean(), psi - psi.mean())
+
+    def _summary(self, estimate: float, psi: np.ndarray) -> pd.Series:
+        """Estimate with standard error from the influence function psi."""
+        std_err = np.sqrt(np.mean(psi**2) / len(psi))
+        return pd.Series({'estimate': estimate, 'std_err': std_err,
+                          'p_value': 2 * norm.sf(np.abs(estimate / std_err))})
@@ -0,0 +1,93 @@
+"""CUPED and CUPAC variance reduction, batched over many simulated experiments."""
+
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+
+def _stack_covariates(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Covariates as a (draws, n, k) array, from (draws, n) for a single covariate, and from (n,) or (n, k) if the
+    outcomes y are a single (n,) draw."""
+    X = np.asarray(X, dtype=float)
+    X = X[None] if np.ndim(y) == 1 else X
+    return X[..., None] if X.ndim == 2 else X
+
+
+def cuped_theta(y: np.ndarray, X: np.ndarray) -> np.ndarray:
+    """CUPED coefficients theta = Var(X)^-1 Cov(X, y), for every draw.
+
+    Args:
+        y: (draws, n) outcomes
+        X: (draws, n) covariate or (draws, n, k) covariates
+
+    Returns:
+        (draws, k) coefficients
+    """
+    X = _stack_covariates(X, y)
+    y = np.atleast_2d(y)
+    Xc = X - X.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    cov_xx = np.einsum('dnk,dnl->dkl', Xc, Xc)
+    cov_xy = np.einsum('dnk,dn->dk', Xc, yc)
+    return np.linalg.solve(cov_xx, cov_xy[..., None])[..., 0]
+
+
+def cupac_theta(cov: np.ndarray) -> np.ndarray:
+    """CUPAC coefficients from a precomputed covariance matrix of [y, x1, ..., xk], e.g. on historical data."""
+    cov = np.asarray(cov, dtype=float)
+    return np.linalg.solve(cov[1:, 1:], cov[1:, 0])
+
+
+def cuped_adjust(y: np.ndarray, X: np.ndarray, theta: np.ndarray = None) -> np.ndarray:
+    """Adjusted outcomes y - theta'(X - mean(X)), for every draw.
+
+    Args:
+        y: (draws, n) outcomes
+        X: (draws, n) covariate or (draws, n, k) covariates
+        theta: (draws, k) or (k,) coefficients, estimated on each draw by default
+
+    Returns:
+        (draws, n) adjusted outcomes
+    """
+    X = _stack_covariates(X, y)
+    y = np.atleast_2d(y)
+    theta = cuped_theta(y, X) if theta is None else np.broadcast_to(theta, (len(y), X.shape[2]))
+    return y - np.einsum('dnk,dk->dn', X - X.mean(axis=1, keepdims=True), theta)
+
+
+def diff_in_means(y: np.ndarray, d: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Difference in means between treated and control units and its standard error, for every draw."""
+    y = np.atleast_2d(y)
+    d = np.atleast_2d(d).astype(bool)
+    n1, n0 = d.sum(1), (~d).sum(1)
+    mean1 = np.where(d, y, 0).sum(1) / n1
+    mean0 = np.where(d, 0, y).sum(1) / n0
+    var1 = np.where(d, (y - mean1[:, None])**2, 0).sum(1) / (n1 - 1)
+    var0 = np.where(d, 0, (y - mean0[:, None])**2).sum(1) / (n0 - 1)
+    return mean1 - mean0, np.sqrt(var1 / n1 + var0 / n0)
+
+
+def cuped_effect(y: np.ndarray, d: np.ndarray, X: np.ndarray, theta: np.ndarray = None, cov: np.ndarray = None) -> pd.DataFrame:
+    """Difference in means and CUPED estimates of the treatment effect, for every draw.
+
+    Theta is estimated on each draw by default. Passing theta fixes it (theta=1 gives the
+    difference-in-differences estimator), passing the covariance of [y, X] gives CUPAC coefficients.
+
+    Args:
+        y: (draws, n) outcomes
+        d: (draws, n) treatment assignments
+        X: (draws, n) covariate or (draws, n, k) covariates
+        theta: (draws, k) or (k,) adjustment coefficients
+        cov: (k+1, k+1) covariance matrix of [y, x1, ..., xk]
+
+    Returns:
+        dataframe with one row per draw and columns estimate, std_err, estimate_cuped, std_err_cuped and
+        variance_reduction
+    """
+    if cov is not None:
+        theta = cupac_theta(cov)
+    estimate, std_err = diff_in_means(y, d)
+    estimate_cuped, std_err_cuped = diff_in_means(cuped_adjust(y, X, theta), d)
+    return pd.DataFrame({'estimate': estimate, 'std_err': std_err,
+                         'estimate_cuped': estimate_cuped, 'std_err_cuped': std_err_cuped,
+                         'variance_reduction': 1 - std_err_cuped**2 / std_err**2})
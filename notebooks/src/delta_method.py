@@ -0,0 +1,117 @@
+"""Delta-method inference on ratio metrics from grouped sufficient statistics."""
+
+import numpy as np
+import pandas as pd
+from typing import Iterable, List
+from scipy.stats import norm
+from .balance import group_codes
+
+
+class RatioStats:
+    """Per-group sufficient statistics of many (numerator, denominator) pairs.
+
+    For every group and metric, stores the number of observations, the sums of the numerator and of the
+    denominator, their sums of squares and the sum of their cross products. Statistics computed on chunks
+    of data can be merged with `+`, so that one scan of the data is enough for all estimates.
+    """
+
+    def __init__(self, metrics: List[str], groups: np.ndarray, n: np.ndarray, sums: np.ndarray):
+        """Sufficient statistics
+
+        Args:
+            metrics: list of metric names
+            groups: group labels
+            n: number of observations per group, shape (G,)
+            sums: sums of numerator, denominator, their squares and their product, shape (5, G, K)
+        """
+        self.metrics = list(metrics)
+        self.groups = np.asarray(groups)
+        self.n = np.asarray(n, dtype=float)
+        self.sums = np.asarray(sums, dtype=float)
+
+    @classmethod
+    def from_data(cls, df: pd.DataFrame, numerators: List[str], denominators: List[str], treatment: str):
+        """Computes the statistics of the ratios numerators[k] / denominators[k] by treatment group."""
+        codes, groups = group_codes(df[treatment])
+        keep = codes >= 0
+        onehot = (codes[keep, None] == np.arange(len(groups))[None, :]).astype(float)
+        Y = df.loc[keep, numerators].to_numpy(dtype=float)
+        X = df.loc[keep, denominators].to_numpy(dtype=float)
+        sums = np.stack([onehot.T @ Y, onehot.T @ X, onehot.T @ Y**2, onehot.T @ X**2, onehot.T @ (Y * X)])
+        metrics = [f"{y}/{x}" for y, x in zip(numerators, denominators)]
+        return cls(metrics, groups, onehot.sum(0), sums)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame], numerators: List[str], denominators: List[str], treatment: str):
+        """Computes the statistics in one pass over an iterable of dataframes (e.g. pd.read_csv with chunksize)."""
+        stats = None
+        for chunk in chunks:
+            chunk_stats = cls.from_data(chunk, numerators, denominators, treatment)
+            stats = chunk_stats if stats is None else stats + chunk_stats
+        return stats
+
+    def __add__(self, other: "RatioStats") -> "RatioStats":
+        """Merges the statistics of two disjoint samples, aligning groups by label."""
+        assert self.metrics == other.metrics, "Statistics refer to different metrics."
+        groups = np.union1d(self.groups, other.groups)
+        n = np.zeros(len(groups))
+        sums = np.zeros((5, len(groups), len(self.metrics)))
+        for stats in [self, other]:
+            idx = np.searchsorted(groups, stats.groups)
+            n[idx] += stats.n
+            sums[:, idx] += stats.sums
+        return RatioStats(self.metrics, groups, n, sums)
+
+    def moments(self):
+        """Per-group means, variances and covariance of numerators and denominators, shape (G, K)."""
+        n = self.n[:, None]
+        mean_y, mean_x = self.sums[0] / n, self.sums[1] / n
+        var_y = (self.sums[2] - n * mean_y**2) / (n - 1)
+        var_x = (self.sums[3] - n * mean_x**2) / (n - 1)
+        cov_xy = (self.sums[4] - n * mean_x * mean_y) / (n - 1)
+        return mean_y, mean_x, var_y, var_x, cov_xy
+
+    def _control(self, control) -> int:
+        return 0 if control is None else int(np.flatnonzero(self.groups == control)[0])
+
+    def ratio_of_means(self, control=None) -> pd.DataFrame:
+        """Ratio of means mean(y)/mean(x) in every group, and its difference from the control group.
+
+        Returns:
+            tidy dataframe with columns metric, group, ratio, std_err, diff, diff_std_err and p_value (the last
+            two are not defined for the control group)
+        """
+        c = self._control(control)
+        mean_y, mean_x, var_y, var_x, cov_xy = self.moments()
+        ratio = mean_y / mean_x
+        var = (var_y - 2 * ratio * cov_xy + ratio**2 * var_x) / (mean_x**2 * self.n[:, None])
+        diff = ratio - ratio[c]
+        diff_se = np.sqrt(var + var[c])
+        diff_se[c] = np.nan
+        p_value = 2 * norm.sf(np.abs(diff / diff_se))
+        return self._table(ratio=ratio, std_err=np.sqrt(var), diff=diff, diff_std_err=diff_se, p_value=p_value)
+
+    def ratio_of_differences(self, control=None) -> pd.DataFrame:
+        """Ratio of the differences in means from the control group, e.g. the return on investment ΔR/ΔC.
+
+        Returns:
+            tidy dataframe with columns metric, group, estimate, std_err and p_value (not defined for the control)
+        """
+        c = self._control(control)
+        mean_y, mean_x, var_y, var_x, cov_xy = self.moments()
+        n = self.n[:, None]
+        delta_y, delta_x = mean_y - mean_y[c], mean_x - mean_x[c]
+        var_dy, var_dx, cov_d = var_y / n + var_y[c] / n[c], var_x / n + var_x[c] / n[c], cov_xy / n + cov_xy[c] / n[c]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rho = delta_y / delta_x
+            std_err = np.sqrt(var_dy - 2 * rho * cov_d + rho**2 * var_dx) / np.abs(delta_x)
+        p_value = 2 * norm.sf(np.abs(rho / std_err))
+        table = self._table(estimate=rho, std_err=std_err, p_value=p_value)
+        return table[table['group'] != self.groups[c]].reset_index(drop=True)
+
+    def _table(self, **columns) -> pd.DataFrame:
+        G, K = len(self.groups), len(self.metrics)
+        table = pd.DataFrame({'metric': np.tile(self.metrics, G), 'group': np.repeat(self.groups, K)})
+        for name, values in columns.items():
+            table[name] = np.ravel(values)
+        return table
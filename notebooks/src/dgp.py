@@ -1,9 +1,19 @@
 """Data-generating process class."""
 
-import pandas as pd
-from typing import List
-from joblib import Parallel, delayed
+from __future__ import annotations
+
+from typing import List, TYPE_CHECKING
 from abc import abstractmethod
+from .profiling import StageProfiler, profiled_draw
+
+# pandas and joblib are imported on use, so that importing DGP (e.g. in joblib workers) stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _call(name: str, func, *args, **kwargs):
+    """Calls func, with the signature of StageProfiler.call."""
+    return func(*args, **kwargs)
 
 
 class DGP:
@@ -69,26 +79,40 @@ class DGP:
         """Post-treatment processing."""
         return df
 
-    def generate_data(self, seed_dt=0, seed_po=1, seed_as=2, seed_pt=3, drop_unobservables: bool = True, **kwargs) -> pd.DataFrame:
-        """Generate potential outcomes, add assignment and select realized outcomes."""
-        df = self.initialize_data(seed=seed_dt)
-        df = self.add_potential_outcomes(df=df, seed=seed_po, **kwargs)
-        df = self.add_treatment_assignment(df=df, seed=seed_as)
-        self.check_potential_outcomes(df=df)
-        df = self.add_realized_outcomes(df, drop_unobservables=drop_unobservables)
-        return self.post_treatment_processing(df=df, seed=seed_pt)
+    def generate_data(self, seed_dt=0, seed_po=1, seed_as=2, seed_pt=3, drop_unobservables: bool = True,
+                      profiler: StageProfiler = None, **kwargs) -> pd.DataFrame:
+        """Generate potential outcomes, add assignment and select realized outcomes. Stages are recorded by the profiler, if any."""
+        run = _call
+        if profiler is not None:
+            profiler.tags['dgp'] = type(self).__name__
+            run = profiler.call
+        df = run('initialize_data', self.initialize_data, seed=seed_dt)
+        df = run('add_potential_outcomes', self.add_potential_outcomes, df=df, seed=seed_po, **kwargs)
+        df = run('add_treatment_assignment', self.add_treatment_assignment, df=df, seed=seed_as)
+        run('check_potential_outcomes', self.check_potential_outcomes, df=df)
+        df = run('add_realized_outcomes', self.add_realized_outcomes, df, drop_unobservables=drop_unobservables)
+        return run('post_treatment_processing', self.post_treatment_processing, df=df, seed=seed_pt)
 
-    def evaluate_f_redrawing_data(self, f, n_draws: int):
+    def _evaluate(self, f, seeds: List[dict], profiler: StageProfiler = None) -> list:
+        """Evaluates f on the draws generated with every set of seeds, in parallel.
+
+        With a profiler, draws are also generated in the workers and their stage records are added to the profiler.
+        """
+        from joblib import Parallel, delayed
+        if profiler is None:
+            return Parallel(n_jobs=8)(delayed(f)(self.generate_data(**s)) for s in seeds)
+        out = Parallel(n_jobs=8)(delayed(profiled_draw)(self, f, s, i, profiler.memory) for i, s in enumerate(seeds))
+        profiler.records += [record for _, records in out for record in records]
+        return [result for result, _ in out]
+
+    def evaluate_f_redrawing_data(self, f, n_draws: int, profiler: StageProfiler = None):
         """Evaluates the function f on n_draws of the data (data, potential outcomes, and treatment assignment)."""
-        results = Parallel(n_jobs=8)(delayed(f)(self.generate_data(seed_dt=i, seed_po=n_draws+1, seed_as=2*n_draws+i)) for i in range(n_draws))
-        return results
+        return self._evaluate(f, [dict(seed_dt=i, seed_po=n_draws+1, seed_as=2*n_draws+i) for i in range(n_draws)], profiler)
 
-    def evaluate_f_redrawing_potential_outcomes(self, f, n_draws: int):
+    def evaluate_f_redrawing_potential_outcomes(self, f, n_draws: int, profiler: StageProfiler = None):
         """Evaluates the function f on n_draws of the potential outcomes, and treatment assignment (not the data)."""
-        results = Parallel(n_jobs=8)(delayed(f)(self.generate_data(seed_po=n_draws+1, seed_as=2*n_draws+i)) for i in range(n_draws))
-        return results
-    
-    def evaluate_f_redrawing_assignment(self, f, n_draws: int):
+        return self._evaluate(f, [dict(seed_po=n_draws+1, seed_as=2*n_draws+i) for i in range(n_draws)], profiler)
+
+    def evaluate_f_redrawing_assignment(self, f, n_draws: int, profiler: StageProfiler = None):
         """Evaluates the function f on n_draws of the treatment assignment (not the data, or the potential outcomes)."""
-        results = Parallel(n_jobs=8)(delayed(f)(self.generate_data(seed_as=2*n_draws+i)) for i in range(n_draws))
-        return results
+        return self._evaluate(f, [dict(seed_as=2*n_draws+i) for i in range(n_draws)], profiler)
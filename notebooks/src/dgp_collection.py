@@ -2,7 +2,32 @@
 
 import numpy as np
 import pandas as pd
-from dgp import DGP
+from .dgp import DGP
+
+
+def draw_categorical(levels: list, size: int, compact: bool = False, p: list = None):
+    """Draws integer codes with np.random.choice, returned as a pandas Categorical in compact mode and as labels otherwise.
+
+    Both modes consume the random stream in the same way, so they generate the same data.
+    """
+    codes = np.random.choice(len(levels), size=size, p=p)
+    return pd.Categorical.from_codes(codes, levels) if compact else np.asarray(levels)[codes]
+
+
+def compact_dtypes(df: pd.DataFrame, float32: list = None) -> pd.DataFrame:
+    """Casts integer columns to the smallest integer dtype that holds them, and the float columns in float32 to float32.
+
+    Other float columns, e.g. amounts rounded to cents, stay float64, since float32 does not hold their values exactly.
+    """
+    float32 = float32 or []
+    for c in df.columns:
+        if pd.api.types.is_bool_dtype(df[c]):
+            continue
+        if pd.api.types.is_integer_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], downcast='integer')
+        elif pd.api.types.is_float_dtype(df[c]) and c in float32:
+            df[c] = df[c].astype(np.float32)
+    return df
 
 
 class dgp_notification_newsletter(DGP):
@@ -101,21 +126,23 @@ class dgp_online_discounts(DGP):
     X: list[str] = ['time', 'device', 'browser', 'region']
     D: str = 'discount'
     Y: list[str] = ['spend']
+    compact: bool = False
 
     def generate_baseline(self, seed:int = 0):
         np.random.seed(seed)
         time = np.random.beta(1, 1, size=self.n) * 24
-        device = np.random.choice(self.devices, size=self.n)
-        browser = np.random.choice(self.browsers, size=self.n)
-        region = np.random.choice(self.regions, size=self.n)
+        device = draw_categorical(self.devices, self.n, self.compact)
+        browser = draw_categorical(self.browsers, self.n, self.compact)
+        region = draw_categorical(self.regions, self.n, self.compact)
         spend_c = np.random.exponential(10, self.n) - 5
         df = pd.DataFrame({'spend_c': spend_c, 'time': time, 'device': device, 'browser': browser, 'region': region})
-        return df
+        return compact_dtypes(df, float32=['spend_c', 'time']) if self.compact else df
     
     def add_treatment_effect(self, df, seed:int = 0):
         np.random.seed(seed)
+        # On categorical columns, comparisons with a level are evaluated on the integer codes
         effect = 7*np.exp(-(df.time-18)**2/100) + 3*(df.browser=='safari') - 2*(df.device=='desktop') + (df.region=='3') - 2.5
-        df['effect_on_spend'] = np.maximum(0, effect)
+        df['effect_on_spend'] = np.maximum(0, effect).astype(df.time.dtype)
         return df
 
 
@@ -246,6 +273,23 @@ class dgp_aipw():
 
         return df
 
+    def generate_arrays(self, seed=1, N=1000, K=1000):
+        """K draws as (K, N) arrays, draw k being identical to generate_data(seed=seed+k)."""
+        x, u = np.empty((self.p, K, N)), np.empty((K, N))
+        for k in range(K):
+            np.random.seed(seed + k)
+            x[:, k] = np.random.normal(0, 1, (N, self.p)).T
+            u[k] = np.random.uniform(0, 1, N)
+
+        # Propensity score, treatment and outcomes, for all draws at once
+        e = 1 / (1 + np.exp(- x[0]))
+        T = (u < e).astype(int)
+        Y0 = np.maximum(x[0] + x[1], 0) - 0.05 * T
+        Y1 = np.maximum(x[0] + x[2], 0) - 0.05 * T - 0.05
+        Y = Y0 * (1-T) + Y1 * T
+
+        return {**dict(zip(self.X, x)), 'e': e, 'T': T, 'Y0': Y0, 'Y1': Y1, 'Y': Y}
+
 
 class dgp3():
     """
@@ -474,7 +518,32 @@ class dgp_did():
 
         # Return
         return df
-    
+
+    def generate_arrays(self, seed=1, N=100, T=20, oracle=False):
+        """One panel as arrays, identical to generate_data(seed=seed), with unit = 2*(id-1) + treated."""
+        np.random.seed(seed)
+
+        # Init indices in the meshgrid order of generate_data: by treated, then day, then id
+        treated = np.repeat(np.array([0, 1], dtype=np.int32), T*(N-1))
+        day = np.tile(np.repeat(np.arange(1, T+1, dtype=np.int32), N-1), 2)
+        id = np.tile(np.arange(1, N, dtype=np.int32), 2*T)
+        unit = 2*(id-1) + treated
+
+        # Treatment
+        alpha_i = np.sqrt(id) - 3*(id>10)
+        gamma_t = 0.1*day + np.random.normal(size=len(day))
+        tau_it = 0.5*np.log(1+id) - 0.12*day
+
+        # Effect
+        post = day > T/2
+        revenue = alpha_i + gamma_t + 1.2*treated + post*treated*tau_it + np.random.normal(size=len(day))
+
+        # Return arrays
+        data = {'day': day, 'unit': unit, 'id': id, 'treated': treated, 'post': post, 'revenue': revenue}
+        if oracle:
+            data.update({'alpha_i': alpha_i, 'gamma_t': gamma_t, 'tau_it': tau_it})
+        return data
+
     
 class dgp_school():
     """
@@ -611,6 +680,16 @@ class dgp_pretest():
         df = pd.DataFrame({'ads': ads, 'sales': sales, 'past_sales': past_sales})
 
         return df
+
+    def generate_arrays(self, a=1, b=.3, c=3, N=1000, K=1000, seed=0):
+        """K draws as (K, N) arrays, draw k being identical to generate_data(seed=seed+k)."""
+        draws = np.empty((3, K, N))
+        for k in range(K):
+            np.random.seed(seed + k)
+            draws[0, k] = np.random.normal(5, 1, N)
+            draws[1, k] = c*draws[0, k] + np.random.normal(-3, 1, N)
+            draws[2, k] = a*draws[1, k] + b*draws[0, k] + np.random.normal(0, 1, N)
+        return dict(zip(['past_sales', 'ads', 'sales'], draws))
     
     
 class dgp_rnd_assignment():
@@ -618,23 +697,28 @@ class dgp_rnd_assignment():
     Data Generating Process: random assignment 
     """
     
-    def generate_data(self, N=1000, seed=1):
+    def generate_data(self, N=1000, seed=1, compact=False):
         np.random.seed(seed)
         
         # Treatment assignment
-        group = np.random.choice(['treatment', 'control'], N, p=[0.3, 0.7])
+        group = draw_categorical(['treatment', 'control'], N, compact, p=[0.3, 0.7])
+        treated = (group == 'treatment') if not compact else (group.codes == 0)
         arm_number = np.random.choice([1,2,3,4], N)
-        arm = [f'arm {n}' for n in arm_number]
+        arm_levels = [f'arm {n}' for n in range(1, 5)]
+        arm = pd.Categorical.from_codes(np.where(treated, arm_number - 1, -1), arm_levels) if compact \
+            else np.asarray(arm_levels, dtype=object)[arm_number - 1]
 
         # Covariates 
-        gender = np.random.binomial(1, 0.5 + 0.1*(group=='treatment'), N) 
-        age = np.rint(18 + np.random.beta(2 + (group=='treatment'), 5, N)*50)
+        gender = np.random.binomial(1, 0.5 + 0.1*treated, N) 
+        age = np.rint(18 + np.random.beta(2 + treated, 5, N)*50)
         mean_income = 6 + 0.1*arm_number
-        var_income = 0.2 + 0.1*(group=='treatment')
+        var_income = 0.2 + 0.1*treated
         income = np.round(np.random.lognormal(mean_income, var_income, N), 2)
 
         # Generate the dataframe
         df = pd.DataFrame({'Group': group, 'Arm': arm, 'Gender': gender, 'Age': age, 'Income': income})
+        if compact:
+            return compact_dtypes(df, float32=['Age'])
         df.loc[df['Group']=='control', 'Arm'] = np.nan
 
         return df
@@ -703,7 +787,17 @@ class dgp_cuped():
         df = pd.DataFrame({'i': i, 'ad_campaign': d, 'revenue0': y0, 'revenue1': y1})
 
         return df
-    
+
+    def generate_arrays(self, N=100, K=1000, seed=1):
+        """K draws as (K, N) arrays, draw k being identical to generate_data(seed=seed+k)."""
+        draws = np.empty((3, K, N))
+        for k in range(K):
+            np.random.seed(seed + k)
+            draws[0, k] = np.random.binomial(1, 0.5, N)
+            draws[1, k] = self.alpha + self.beta*draws[0, k] + np.random.normal(0, 1, N)
+            draws[2, k] = draws[1, k] + self.gamma + self.delta*draws[0, k] + np.random.normal(0, 1, N)
+        return {'ad_campaign': draws[0].astype(int), 'revenue0': draws[1], 'revenue1': draws[2]}
+
 
 class dgp_darkmode():
     """
@@ -899,20 +993,21 @@ class dgp_loyalty():
     Data Generating Process: loyalty card
     """
 
-    def generate_data(self, seed=1, N=10_000):
+    def generate_data(self, seed=1, N=10_000, compact=False):
         np.random.seed(seed)
 
         # Treatment
         age = np.random.randint(18, 55, N)
-        gender = np.random.choice(['Male', 'Female'], p=[0.6, 0.4], size=N)
+        gender = draw_categorical(['Male', 'Female'], N, compact, p=[0.6, 0.4])
+        female = (gender == 'Female') if not compact else (gender.codes == 1)
         income = np.random.lognormal(4 + np.log(age), 0.1, N)
         loyalty = np.random.binomial(1, 0.5, N)
 
         # Spend
-        spend = 50*(gender=='Female') + income/10 + loyalty*np.sqrt(age)
+        spend = 50*female + income/10 + loyalty*np.sqrt(age)
         spend = np.maximum(np.round(spend, 2) - 220, 0)
 
         # Generate the dataframe
         df = pd.DataFrame({'loyalty': loyalty, 'spend': spend, 'age': age, 'gender': gender})
 
-        return df
\ No newline at end of file
+        return compact_dtypes(df) if compact else df
\ No newline at end of file
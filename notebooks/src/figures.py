@@ -5,26 +5,28 @@ Date:   24/03/2022
 """
 
 import numpy as np
-import pandas as pd
 from numpy.linalg import inv
-from scipy.stats import norm
-import statsmodels.api as sm
+from .lazy import LazyModule, lazy_gif_frame
 
-import gif
-import binsreg
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
+# Data, plotting and statistics libraries are only imported when a figure is drawn
+pd = LazyModule('pandas')
+stats = LazyModule('scipy.stats')
+sm = LazyModule('statsmodels.api')
+gif = LazyModule('gif')
+binsreg = LazyModule('binsreg')
+mpl = LazyModule('matplotlib')
+plt = LazyModule('matplotlib.pyplot')
+sns = LazyModule('seaborn')
 
 
 def plot_test(mu0=0, mu1=3, sigma=1, alpha=0.05, n=100):
     """Plot statistical hypothesis test"""
     s = np.sqrt(sigma**2 / n)
     x = np.linspace(mu0 - 4*s, mu1 + 4*s, 1000)
-    pdf1 = norm(mu0, s).pdf(x)
-    pdf2 = norm(mu1, s).pdf(x)
-    cv = mu0 + norm.ppf(1 - alpha) * s
-    power = norm.cdf(np.abs(mu1 - cv) / s)
+    pdf1 = stats.norm(mu0, s).pdf(x)
+    pdf2 = stats.norm(mu1, s).pdf(x)
+    cv = mu0 + stats.norm.ppf(1 - alpha) * s
+    power = stats.norm.cdf(np.abs(mu1 - cv) / s)
 
     # Plot Distributions
     plt.plot(x, pdf1, label=f'Distribution under H0: μ={mu0}');
@@ -50,7 +52,7 @@ def make_cmap(color1, color2, K):
     return [(K-1-k)/(K-1) * C1 + k/(K-1) * C2  for k in range(K)]
 
 
-@gif.frame
+@lazy_gif_frame
 def dynamic_plot(k, K, A, B, x, y, e, cmap, xname, yname):
     
     k_ = min(max(k, 0), K-1)
@@ -133,7 +135,7 @@ def binscatterplot(data, x, y, hue=None, **kwargs):
     return plot
     
 
-@gif.frame
+@lazy_gif_frame
 def plot_beta(d, N0, N, ci):
     plot = sns.lineplot(x='n', y='beta', data=d.reset_index(drop=True)).\
         set(xlim=[N0-1,N+1], ylim=[-14, 28], title="Estimated Treatment Effect")
@@ -0,0 +1,69 @@
+"""On-first-use loading of heavy dependencies, and a check of import times."""
+
+import functools
+import importlib
+import os
+import re
+import subprocess
+import sys
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported when one of its attributes is first accessed."""
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+
+    def _load(self):
+        module = importlib.import_module(self._name)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_gif_frame(plot):
+    """gif.frame decorator, applied at call time so that defining frames does not import gif."""
+    @functools.wraps(plot)
+    def frame(*args, **kwargs):
+        return importlib.import_module('gif').frame(plot)(*args, **kwargs)
+    return frame
+
+
+def import_times(statement: str = "from src.dgp import DGP") -> dict:
+    """Cumulative import time in seconds of every top-level module imported by statement in a fresh interpreter.
+
+    Args:
+        statement: python statement to time, run from the directory that contains the src package
+
+    Returns:
+        dictionary module -> cumulative seconds, slowest first
+    """
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=cwd, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in out.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S.*)$', line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return dict(sorted(times.items(), key=lambda t: -t[1]))
+
+
+def check_import_time(statement: str = "from src.dgp import DGP", budget: float = 0.05) -> float:
+    """Raises an error if statement takes more than budget seconds of imports, listing the slowest modules.
+
+    Returns:
+        total import time in seconds
+    """
+    times = import_times(statement)
+    total = sum(times.values())
+    if total > budget:
+        slowest = ', '.join(f"{m} ({t * 1000:.0f}ms)" for m, t in list(times.items())[:5])
+        raise RuntimeError(f"'{statement}' takes {total * 1000:.0f}ms of imports, over the {budget * 1000:.0f}ms budget: {slowest}")
+    return total
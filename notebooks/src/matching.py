@@ -0,0 +1,227 @@
+"""Nearest-neighbor matching on KD-trees and entropy balancing weights."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from scipy.spatial import cKDTree
+from scipy.stats import norm
+from .balance import group_codes
+
+
+def whiten(X: np.ndarray, reference: np.ndarray, metric: str = 'mahalanobis') -> np.ndarray:
+    """Transforms X so that Euclidean distances are Mahalanobis distances ('mahalanobis') or distances between
+    standardized covariates ('standardize'), with the covariance of the reference sample."""
+    if metric == 'standardize':
+        return X / np.maximum(reference.std(0), 1e-12)
+    L = np.linalg.cholesky(np.atleast_2d(np.cov(reference, rowvar=False)))
+    return np.linalg.solve(L, X.T).T
+
+
+def strata_codes(df: pd.DataFrame, exact: List[str]) -> np.ndarray:
+    """Integer codes of the strata defined by the exact-matching variables, by hashing their rows."""
+    if not exact:
+        return np.zeros(len(df), dtype=int)
+    return group_codes(pd.util.hash_pandas_object(df[exact], index=False).to_numpy())[0]
+
+
+def _tied_neighbors(P: np.ndarray, counts: np.ndarray, strata: np.ndarray, Q: np.ndarray, query_strata: np.ndarray,
+                    k: int, n_jobs: int, own: np.ndarray = None):
+    """Matched sets of the query points: all pool units within the distance of the k-th nearest one, ties
+    included, within the same stratum.
+
+    The pool holds distinct points P, point p standing for counts[p] units, so that exact ties cost one KD-tree
+    entry. Every stratum gets a KD-tree on its pool points. Queries ask for k+1 points (k+2 with own, whose
+    point comes first) and only the queries whose farthest point is still tied with the k-th nearest unit are
+    queried again, with twice as many points.
+
+    Args:
+        P: (m, p) distinct pool points
+        counts: (m,) number of units at every pool point
+        strata: (m,) stratum codes of the pool points
+        Q: (n, p) query points
+        query_strata: (n,) stratum codes of the query points
+        k: number of matched units
+        own: (n,) pool point of every query, whose units exclude the query unit itself
+
+    Returns:
+        query and pool point indices of the matches, number of matched units at every matched point, and number
+        of matched units per query (fewer than k if the stratum has fewer units)
+    """
+    order = np.argsort(strata, kind='stable')
+    bounds = np.searchsorted(strata[order], np.arange(max(strata.max(), query_strata.max()) + 2))
+    pairs = []
+    for s in np.unique(query_strata):
+        candidates = order[bounds[s]:bounds[s + 1]]
+        if len(candidates) == 0:
+            continue
+        tree = cKDTree(P[candidates])
+        pending = np.flatnonzero(query_strata == s)
+        q = min(k + 1 + (own is not None), len(candidates))
+        while len(pending):
+            dist, idx = tree.query(Q[pending], k=q, workers=n_jobs)
+            dist, points = dist.reshape(len(pending), q), candidates[idx.reshape(len(pending), q)]
+            c = counts[points] - (0 if own is None else points == own[pending, None])
+            cum = c.cumsum(1)
+            kth = dist[np.arange(len(pending)), np.minimum(np.argmax(cum >= k, axis=1), q - 1)]
+            within = (dist <= kth[:, None] * (1 + 1e-9) + 1e-12) | (cum[:, -1:] < k)
+            done = ~within[:, -1] | (q == len(candidates))
+            rows, cols = np.nonzero(within[done] & (c[done] > 0))
+            pairs.append((pending[done][rows], points[done][rows, cols], c[done][rows, cols]))
+            pending, q = pending[~done], min(2 * q, len(candidates))
+    query, point, n = (np.concatenate(x) for x in zip(*pairs)) if pairs else (np.zeros(0, dtype=int),) * 3
+    return query, point, n, np.bincount(query, weights=n, minlength=len(Q))
+
+
+class NearestNeighborMatching:
+    """Matching estimator of the average treatment effect on the treated (Abadie and Imbens, 2006).
+
+    Every treated unit is matched with replacement to its k nearest control units in the whitened covariate
+    space, within its exact-matching stratum, and to all control units tied with the k-th nearest one, which
+    share its match equally. Strata come from hashing the exact-matching variables; controls with identical
+    covariates are collapsed into one point of a KD-tree per stratum, queried by all treated units at once with
+    n_jobs threads. Standard errors use the Abadie-Imbens variance estimator, with conditional variances
+    estimated by matching control units to their nearest other control units, ties included.
+    """
+
+    def __init__(self, k: int = 1, metric: str = 'mahalanobis', exact: List[str] = None,
+                 bias_correction: bool = False, n_variance: int = 1, n_jobs: int = -1):
+        """Matching setup
+
+        Args:
+            k: number of matches per treated unit
+            metric: 'mahalanobis' or 'standardize'
+            exact: variables to match exactly on
+            bias_correction: regression adjustment of the matched outcomes (Abadie and Imbens, 2011)
+            n_variance: number of same-arm neighbors used to estimate conditional variances
+            n_jobs: number of threads for the KD-tree queries
+        """
+        self.k = k
+        self.metric = metric
+        self.exact = exact or []
+        self.bias_correction = bias_correction
+        self.n_variance = n_variance
+        self.n_jobs = n_jobs
+
+    def fit(self, df: pd.DataFrame, y: str, d: str, covariates: List[str]) -> "NearestNeighborMatching":
+        """Matches treated units and estimates the ATT.
+
+        Returns:
+            fitted estimator, with weights_ (matching weight of every unit: the number of treated units matched to
+            a control, each counting one over the size of its matched set, and zero for treated units),
+            unmatched_ (treated rows without matches) and att_ (estimate, std_err, p_value, n_matched, n_unmatched)
+        """
+        Y, D = df[y].to_numpy(dtype=float), df[d].to_numpy().astype(bool)
+        X = df[covariates].to_numpy(dtype=float)
+        Z = whiten(X, X[~D], self.metric)
+        strata = strata_codes(df, self.exact)
+        treated, controls = np.flatnonzero(D), np.flatnonzero(~D)
+
+        # Distinct control points by stratum, with their number of units and outcome sums
+        rows = pd.DataFrame(np.column_stack([strata, Z])[controls])
+        point_of = group_codes(pd.util.hash_pandas_object(rows, index=False).to_numpy())[0]
+        first = np.unique(point_of, return_index=True)[1]
+        counts = np.bincount(point_of)
+        y_sums = np.bincount(point_of, weights=Y[controls])
+        P, P_strata, P_X = Z[controls[first]], strata[controls[first]], X[controls[first]]
+
+        # Matches, dropping treated units in strata without enough controls
+        query, point, n, size = _tied_neighbors(P, counts, P_strata, Z[treated], strata[treated], self.k, self.n_jobs)
+        matched = size >= self.k
+        self.unmatched_ = treated[~matched]
+        keep = matched[query]
+        query, point, n = np.cumsum(matched)[query[keep]] - 1, point[keep], n[keep]
+        treated, size = treated[matched], size[matched]
+
+        # Counterfactual outcomes, with regression adjustment on the controls
+        Y0 = np.bincount(query, weights=y_sums[point], minlength=len(treated)) / size
+        if self.bias_correction:
+            Xc = np.column_stack([np.ones(len(controls)), X[controls]])
+            beta = np.linalg.lstsq(Xc, Y[controls], rcond=None)[0][1:]
+            Y0 = Y0 + X[treated] @ beta - np.bincount(query, weights=n * (P_X[point] @ beta), minlength=len(treated)) / size
+        effects = Y[treated] - Y0
+        att = effects.mean()
+
+        # Matching weights K of the control units and sums K' of their squared shares
+        K = np.bincount(point, weights=1 / size[query], minlength=len(counts))
+        K2 = np.bincount(point, weights=1 / size[query]**2, minlength=len(counts))
+        self.weights_ = np.zeros(len(Y))
+        self.weights_[controls] = K[point_of]
+
+        # Conditional variances of the reused controls, from their nearest other controls (excluding themselves)
+        reused = np.flatnonzero(K > 0)
+        q2, p2, _, size2 = _tied_neighbors(P, counts, P_strata, P[reused], P_strata[reused], self.n_variance,
+                                           self.n_jobs, own=reused)
+        sums2 = np.bincount(q2, weights=y_sums[p2], minlength=len(reused))
+        own_in = np.bincount(q2, weights=p2 == reused[q2], minlength=len(reused)) > 0
+        position = np.full(len(counts), -1)
+        position[reused] = np.arange(len(reused))
+        units = np.flatnonzero(position[point_of] >= 0)
+        r = position[point_of[units]]
+        Yu = Y[controls[units]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sigma2 = size2[r] / (size2[r] + 1) * (Yu - (sums2[r] - own_in[r] * Yu) / size2[r])**2
+
+        # Abadie-Imbens variance: heterogeneity of the effects and conditional variances of the reused controls
+        n1 = len(treated)
+        Kr, K2r = K[point_of[units]], K2[point_of[units]]
+        variance = ((effects - att)**2).sum() / n1**2 + np.nansum((Kr**2 - K2r) * sigma2) / n1**2
+        std_err = np.sqrt(variance)
+        self.att_ = pd.Series({'estimate': att, 'std_err': std_err, 'p_value': 2 * norm.sf(abs(att / std_err)),
+                               'n_matched': n1, 'n_unmatched': len(self.unmatched_)})
+        return self
+
+
+def entropy_balance(X: np.ndarray, target: np.ndarray, base_weights: np.ndarray = None,
+                    max_iter: int = 100, tol: float = 1e-8) -> np.ndarray:
+    """Entropy balancing weights (Hainmueller, 2012): the weights closest to base_weights in entropy such that the
+    weighted means of the columns of X equal target.
+
+    Solves the dual problem min_l log sum_i q_i exp(l'(x_i - target)) by Newton's method with backtracking. The
+    gradient is the gap between the weighted and target means and the Hessian is the weighted covariance, so
+    that every iteration costs one pass over the data.
+
+    Args:
+        X: (n, p) balance functions of the control units (e.g. covariates, their squares and interactions)
+        target: (p,) target means (e.g. of the treated units)
+        base_weights: (n,) base weights, uniform by default
+
+    Returns:
+        (n,) weights summing to one
+    """
+    Xc = np.asarray(X, dtype=float) - np.asarray(target, dtype=float)
+    log_q = np.zeros(len(Xc)) if base_weights is None else np.log(base_weights)
+    lam = np.zeros(Xc.shape[1])
+
+    def dual(lam):
+        a = log_q + Xc @ lam
+        m = a.max()
+        return m + np.log(np.exp(a - m).sum()), np.exp(a - m) / np.exp(a - m).sum()
+
+    value, w = dual(lam)
+    for _ in range(max_iter):
+        grad = w @ Xc
+        if np.max(np.abs(grad)) < tol:
+            break
+        hess = (Xc * w[:, None]).T @ Xc - np.outer(grad, grad)
+        step = np.linalg.lstsq(hess, grad, rcond=None)[0]
+        t = 1.0
+        while True:
+            new_value, new_w = dual(lam - t * step)
+            if new_value <= value - 1e-4 * t * grad @ step or t < 1e-10:
+                break
+            t /= 2
+        lam, value, w = lam - t * step, new_value, new_w
+    else:
+        raise RuntimeError(f"Entropy balancing did not converge in {max_iter} iterations (max imbalance {np.max(np.abs(grad)):.2e}).")
+    return w
+
+
+def entropy_balancing_att(df: pd.DataFrame, y: str, d: str, covariates: List[str], moments: int = 1) -> pd.Series:
+    """ATT as the difference between the mean treated outcome and the entropy-balanced mean control outcome,
+    balancing the first moments (and variances if moments = 2) of the covariates."""
+    D = df[d].to_numpy().astype(bool)
+    X = df[covariates].to_numpy(dtype=float)
+    X = np.column_stack([X] + [X**m for m in range(2, moments + 1)])
+    w = entropy_balance(X[~D], X[D].mean(0))
+    Y = df[y].to_numpy(dtype=float)
+    return pd.Series({'estimate': Y[D].mean() - w @ Y[~D], 'effective_n': 1 / (w**2).sum()})
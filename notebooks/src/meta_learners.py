@@ -0,0 +1,100 @@
+"""S, T, X, R and DR meta-learners fitted together, each nuisance model being fitted only if a learner needs it."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from .crossfit import CrossFitter
+
+
+def _fit(model, X: np.ndarray, y: np.ndarray, sample_weight: np.ndarray = None):
+    """Fits a clone of the model."""
+    model = clone(model)
+    return model.fit(X, y) if sample_weight is None else model.fit(X, y, sample_weight=sample_weight)
+
+
+class MetaLearners:
+    """Runner that fits several meta-learners on one design matrix, fitting each nuisance model only if a
+    selected learner needs it.
+
+    The outcome models E[y|X,d] (S-learner), E[y|X,d=0] and E[y|X,d=1] (T- and X-learners) and the propensity
+    score E[d|X] (X-learner) are fitted on the full sample, since they predict at new X. The R-learner uses the
+    out-of-fold predictions of E[y|X] and E[d|X] of a CrossFitter, and the DR-learner those of E[y|X,d=0],
+    E[y|X,d=1] and E[d|X]: the cross-fitted propensity score is shared, and cached across fits on the same
+    data. Each stage dispatches all its fits to a joblib process pool.
+    """
+
+    learners = ['S', 'T', 'X', 'R', 'DR']
+
+    def __init__(self, model_y, model_e, model_tau, n_folds: int = 5, trim: float = 0.01, n_jobs: int = -1, seed: int = 0):
+        """Meta-learners setup
+
+        Args:
+            model_y: sklearn regressor for the outcome
+            model_e: sklearn classifier for the propensity score
+            model_tau: sklearn regressor for the final stage of the X-, R- and DR-learners
+            n_folds: number of cross-fitting folds of the R- and DR-learners
+            trim: propensity scores are clipped to [trim, 1-trim] in pseudo-outcomes
+            n_jobs: number of parallel jobs
+            seed: random seed of the fold split
+        """
+        self.model_y = model_y
+        self.model_e = model_e
+        self.model_tau = model_tau
+        self.trim = trim
+        self.n_jobs = n_jobs
+        self.crossfitter = CrossFitter(model_y, model_e, n_folds=n_folds, seed=seed, n_jobs=n_jobs)
+
+    def fit(self, X: np.ndarray, y: np.ndarray, d: np.ndarray, learners: List[str] = None) -> "MetaLearners":
+        """Fits the selected learners (all by default)."""
+        X, y, d = np.asarray(X, dtype=float), np.asarray(y, dtype=float), np.asarray(d).astype(int)
+        self.fitted = self.learners if learners is None else learners
+        with Parallel(n_jobs=self.n_jobs) as parallel:
+
+            # Full-sample nuisance models
+            nuisances = {}
+            if 'S' in self.fitted:
+                nuisances['s'] = (self.model_y, np.column_stack([X, d]), y)
+            if {'T', 'X'} & set(self.fitted):
+                nuisances['mu0'] = (self.model_y, X[d == 0], y[d == 0])
+                nuisances['mu1'] = (self.model_y, X[d == 1], y[d == 1])
+            if 'X' in self.fitted:
+                nuisances['e'] = (self.model_e, X, d)
+            self.models = dict(zip(nuisances, parallel(delayed(_fit)(*args) for args in nuisances.values())))
+
+            # Learner-specific final stages
+            stages = {}
+            if 'X' in self.fitted:
+                stages['tau1'] = (self.model_tau, X[d == 1], y[d == 1] - self.models['mu0'].predict(X[d == 1]))
+                stages['tau0'] = (self.model_tau, X[d == 0], self.models['mu1'].predict(X[d == 0]) - y[d == 0])
+            if {'R', 'DR'} & set(self.fitted):
+                names = {'e'} | ({'l'} if 'R' in self.fitted else set()) | ({'mu0', 'mu1'} if 'DR' in self.fitted else set())
+                cf = self.crossfitter.nuisances(X, y, d, names=tuple(sorted(names)))
+                e = np.clip(cf['e'], self.trim, 1 - self.trim)
+                if 'R' in self.fitted:
+                    d_res = d - e
+                    stages['R'] = (self.model_tau, X, (y - cf['l']) / d_res, d_res**2)
+                if 'DR' in self.fitted:
+                    psi = cf['mu1'] - cf['mu0'] + d / e * (y - cf['mu1']) - (1 - d) / (1 - e) * (y - cf['mu0'])
+                    stages['DR'] = (self.model_tau, X, psi)
+            self.models.update(zip(stages, parallel(delayed(_fit)(*args) for args in stages.values())))
+        return self
+
+    def effect(self, X: np.ndarray) -> pd.DataFrame:
+        """Estimated conditional average treatment effects, one column per learner."""
+        X = np.asarray(X, dtype=float)
+        m = self.models
+        effects = {}
+        if 'S' in self.fitted:
+            effects['S'] = m['s'].predict(np.column_stack([X, np.ones(len(X))])) - \
+                m['s'].predict(np.column_stack([X, np.zeros(len(X))]))
+        if 'T' in self.fitted:
+            effects['T'] = m['mu1'].predict(X) - m['mu0'].predict(X)
+        if 'X' in self.fitted:
+            e = m['e'].predict_proba(X)[:, 1]
+            effects['X'] = e * m['tau0'].predict(X) + (1 - e) * m['tau1'].predict(X)
+        for learner in ['R', 'DR']:
+            if learner in self.fitted:
+                effects[learner] = m[learner].predict(X)
+        return pd.DataFrame(effects)
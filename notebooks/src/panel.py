@@ -0,0 +1,105 @@
+"""Two-way fixed effects and event-study regressions on large panels."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from scipy.stats import t as t_dist
+from .balance import group_codes
+from .cluster import cluster_vcov
+
+
+class Panel:
+    """Panel of observations indexed by integer unit and time codes.
+
+    Fixed effects are absorbed by alternating projections: the unit means and the time means, computed with
+    np.bincount, are subtracted in turn until convergence. No dummy matrix is ever built.
+    """
+
+    def __init__(self, unit: np.ndarray, time: np.ndarray):
+        """Panel indices
+
+        Args:
+            unit: unit identifier of every observation
+            time: time period of every observation (numeric for event studies)
+        """
+        self.unit, self.units = group_codes(unit)
+        self.time, self.periods = group_codes(time)
+        self.unit_counts = np.bincount(self.unit, minlength=len(self.units))
+        self.time_counts = np.bincount(self.time, minlength=len(self.periods))
+
+    @classmethod
+    def from_data(cls, df: pd.DataFrame, unit: str, time: str) -> "Panel":
+        return cls(df[unit].to_numpy(), df[time].to_numpy())
+
+    def _demean_by(self, Z: np.ndarray, codes: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        for j in range(Z.shape[1]):
+            Z[:, j] -= (np.bincount(codes, weights=Z[:, j], minlength=len(counts)) / counts)[codes]
+        return Z
+
+    def demean(self, Z: np.ndarray, tol: float = 1e-8, max_iter: int = 1000) -> np.ndarray:
+        """Residuals of the columns of Z on unit and time fixed effects.
+
+        Args:
+            Z: (n,) or (n, k) array
+            tol: convergence tolerance on the largest remaining time mean
+            max_iter: maximum number of alternating projections
+
+        Returns:
+            (n, k) array of demeaned variables
+        """
+        Z = np.array(Z, dtype=float).reshape(len(self.unit), -1)
+        for _ in range(max_iter):
+            Z = self._demean_by(Z, self.time, self.time_counts)
+            Z = self._demean_by(Z, self.unit, self.unit_counts)
+            # After the unit step, unit means are zero: check the time means
+            time_means = np.stack([np.bincount(self.time, weights=z, minlength=len(self.periods)) for z in Z.T])
+            if np.abs(time_means / self.time_counts).max() < tol:
+                break
+        return Z
+
+    def twfe(self, y: np.ndarray, X: np.ndarray, names: List[str] = None) -> pd.DataFrame:
+        """Two-way fixed effects regression of y on X, with standard errors clustered by unit.
+
+        Args:
+            y: (n,) outcome
+            X: (n,) or (n, k) regressors
+            names: regressor names
+
+        Returns:
+            dataframe with columns coef, std_err, t and p_value
+        """
+        Z = self.demean(np.column_stack([y, X]))
+        y_tilde, X_tilde = Z[:, 0], Z[:, 1:]
+        XX_inv = np.linalg.inv(X_tilde.T @ X_tilde)
+        beta = XX_inv @ X_tilde.T @ y_tilde
+        resid = y_tilde - X_tilde @ beta
+        std_err = np.sqrt(np.diag(cluster_vcov(X_tilde, resid, self.unit, XX_inv=XX_inv)))
+        t = beta / std_err
+        G = len(self.units)
+        names = [f"x{j}" for j in range(len(beta))] if names is None else names
+        return pd.DataFrame({'coef': beta, 'std_err': std_err, 't': t, 'p_value': 2 * t_dist.sf(np.abs(t), G - 1)},
+                            index=names)
+
+    def event_study(self, y: np.ndarray, treatment_time: np.ndarray, leads: int = 5, lags: int = 5) -> pd.DataFrame:
+        """Event-study regression of y on leads and lags of the treatment, with unit and time fixed effects.
+
+        Relative periods beyond the window are binned into the first and last lead/lag, and the period before
+        treatment is the omitted reference.
+
+        Args:
+            y: (n,) outcome
+            treatment_time: (n,) period in which the unit is first treated, NaN for never-treated units
+            leads: number of pre-treatment periods
+            lags: number of post-treatment periods
+
+        Returns:
+            dataframe indexed by relative period, with columns coef, std_err, t and p_value
+        """
+        relative = self.periods[self.time] - np.asarray(treatment_time, dtype=float)
+        treated = ~np.isnan(relative)
+        relative = np.clip(np.where(treated, relative, 0), -leads, lags)
+        periods = [r for r in range(-leads, lags + 1) if r != -1]
+        X = np.column_stack([treated & (relative == r) for r in periods]).astype(float)
+        table = self.twfe(y, X, names=periods)
+        table.index.name = 'relative_period'
+        return table
@@ -0,0 +1,211 @@
+"""Post-double-selection with a batched coordinate-descent lasso, and pre-testing simulations."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from joblib import Parallel, delayed
+from scipy.stats import norm
+
+
+def lasso_cd(G: np.ndarray, c: np.ndarray, lam: np.ndarray, beta: np.ndarray = None,
+             tol: float = 1e-8, max_iter: int = 1000) -> np.ndarray:
+    """Coordinate descent for min_b 1/2 b'Gb - c'b + lam ||b||_1, solving one problem per draw at once.
+
+    Works on the Gram matrix G = X'X/n and c = X'y/n, keeping the gradient c - Gb up to date, so that every
+    coordinate update costs O(p) per draw whatever the number of observations.
+
+    Args:
+        G: (K, p, p) Gram matrices
+        c: (K, p) covariances with the outcome
+        lam: (K,) penalties
+        beta: (K, p) starting values, zero by default
+
+    Returns:
+        (K, p) coefficients
+    """
+    K, p = c.shape
+    b = np.zeros((K, p)) if beta is None else beta.copy()
+    q = c - np.einsum('kij,kj->ki', G, b)
+    diag = np.maximum(np.diagonal(G, axis1=1, axis2=2), 1e-12)
+    for _ in range(max_iter):
+        change = 0
+        for j in range(p):
+            z = q[:, j] + diag[:, j] * b[:, j]
+            delta = np.sign(z) * np.maximum(np.abs(z) - lam, 0) / diag[:, j] - b[:, j]
+            if np.any(delta):
+                q -= G[:, :, j] * delta[:, None]
+                b[:, j] += delta
+                change = max(change, np.max(np.abs(delta) * np.sqrt(diag[:, j])))
+        if change < tol:
+            break
+    return b
+
+
+def lasso_path(G: np.ndarray, c: np.ndarray, lambdas: np.ndarray, beta: np.ndarray = None, **kwargs) -> np.ndarray:
+    """Lasso coefficients along decreasing penalties lambdas (K, L), each warm-started from the previous one.
+
+    Returns:
+        (K, L, p) coefficients
+    """
+    path = np.empty(lambdas.shape + c.shape[1:])
+    for l in range(lambdas.shape[1]):
+        beta = lasso_cd(G, c, lambdas[:, l], beta, **kwargs)
+        path[:, l] = beta
+    return path
+
+
+def restricted_ols(G: np.ndarray, c: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Solves G_SS b_S = c_S on the variables S selected by mask (K, p) for every draw, with b = 0 elsewhere."""
+    A = np.where(mask[:, :, None] & mask[:, None, :], G, np.eye(G.shape[-1]))
+    return np.linalg.solve(A, np.where(mask, c, 0)[..., None])[..., 0]
+
+
+class PostDoubleSelection:
+    """Post-double-selection estimator of the effect of d on y with controls X (Belloni, Chernozhukov and Hansen, 2014).
+
+    Controls are selected by two lasso regressions, of y on X and of d on X, with the homoskedastic plug-in
+    penalty, and the effect is estimated by OLS of y on d and the union of the selected controls. K draws of
+    the same size are processed at once: every step is vectorized over draws and only needs the Gram matrices
+    of the standardized controls. The first fit follows a warm-started penalty path from the largest
+    useful penalty; later fits on draws of the same shape warm-start directly from the previous solutions.
+    """
+
+    def __init__(self, c: float = 1.1, gamma: float = None, n_lambdas: int = 10, warm_start: bool = True,
+                 tol: float = 1e-8, max_iter: int = 1000):
+        """Estimator setup
+
+        Args:
+            c: constant of the plug-in penalty
+            gamma: significance level of the plug-in penalty, by default 0.1 / log(n)
+            n_lambdas: number of penalties on the path
+            warm_start: start from the solutions of the previous fit, if of the same shape
+            tol, max_iter: coordinate descent convergence parameters
+        """
+        self.c = c
+        self.gamma = gamma
+        self.n_lambdas = n_lambdas
+        self.warm_start = warm_start
+        self.tol = tol
+        self.max_iter = max_iter
+        self.coef_y_, self.coef_d_ = None, None
+
+    def _lasso(self, G, cov, resid_sd, n, beta):
+        p = cov.shape[1]
+        gamma = self.gamma or 0.1 / np.log(n)
+        lam = self.c * resid_sd * norm.ppf(1 - gamma / (2 * p)) / np.sqrt(n)
+        if beta is not None and beta.shape == cov.shape:
+            return lasso_cd(G, cov, lam, beta, self.tol, self.max_iter)
+        lam_max = np.maximum(np.abs(cov).max(1), lam)
+        lambdas = np.exp(np.linspace(np.log(lam_max), np.log(lam), self.n_lambdas).T)
+        return lasso_path(G, cov, lambdas, tol=self.tol, max_iter=self.max_iter)[:, -1]
+
+    def fit(self, y: np.ndarray, d: np.ndarray, X: np.ndarray) -> "PostDoubleSelection":
+        """Fits the estimator on K draws: y and d of shape (K, n), X of shape (K, n, p).
+
+        Returns:
+            fitted estimator, with estimates_ (estimate, std_err, n_selected per draw) and the masks selected_
+        """
+        y, d, X = np.atleast_2d(y).astype(float), np.atleast_2d(d).astype(float), np.asarray(X, dtype=float)
+        X = X if X.ndim == 3 else X[None]
+        K, n, p = X.shape
+
+        # Gram matrices of the centered and standardized controls
+        y, d, X = y - y.mean(1, keepdims=True), d - d.mean(1, keepdims=True), X - X.mean(1, keepdims=True)
+        X = X / np.maximum(X.std(1, keepdims=True), 1e-12)
+        G = np.einsum('kni,knj->kij', X, X) / n
+        cy, cd = np.einsum('kni,kn->ki', X, y) / n, np.einsum('kni,kn->ki', X, d) / n
+
+        # Lasso selection, with residual standard deviations of the OLS fits for the plug-in penalties
+        full = np.ones((K, p), dtype=bool)
+        sd_y = np.sqrt(np.maximum((y**2).mean(1) - (restricted_ols(G, cy, full) * cy).sum(1), 0) * n / (n - p))
+        sd_d = np.sqrt(np.maximum((d**2).mean(1) - (restricted_ols(G, cd, full) * cd).sum(1), 0) * n / (n - p))
+        warm = self.warm_start and self.coef_y_ is not None
+        self.coef_y_ = self._lasso(G, cy, sd_y, n, self.coef_y_ if warm else None)
+        self.coef_d_ = self._lasso(G, cd, sd_d, n, self.coef_d_ if warm else None)
+        self.selected_ = (self.coef_y_ != 0) | (self.coef_d_ != 0)
+        self.estimates_ = partialled_ols(y, d, X, G, cy, cd, self.selected_)
+        return self
+
+
+def partialled_ols(y: np.ndarray, d: np.ndarray, X: np.ndarray, G: np.ndarray, cy: np.ndarray, cd: np.ndarray,
+                   mask: np.ndarray) -> pd.DataFrame:
+    """OLS coefficient of d in the regression of y on d and the controls selected by mask, by partialling out.
+
+    Returns:
+        dataframe with estimate, heteroskedasticity-robust (HC1) std_err and n_selected, one row per draw
+    """
+    n = y.shape[1]
+    y_res = y - np.einsum('kni,ki->kn', X, restricted_ols(G, cy, mask))
+    d_res = d - np.einsum('kni,ki->kn', X, restricted_ols(G, cd, mask))
+    dd = (d_res**2).sum(1)
+    alpha = (d_res * y_res).sum(1) / dd
+    resid = y_res - alpha[:, None] * d_res
+    s = mask.sum(1)
+    std_err = np.sqrt((d_res**2 * resid**2).sum(1) * n / (n - s - 2)) / dd
+    return pd.DataFrame({'estimate': alpha, 'std_err': std_err, 'n_selected': s})
+
+
+def _estimators(y, d, X, pds: PostDoubleSelection, alpha: float) -> pd.DataFrame:
+    """Long, short, pre-test and post-double-selection estimates on K draws."""
+    K, n, p = X.shape
+    y, d, X = y - y.mean(1, keepdims=True), d - d.mean(1, keepdims=True), X - X.mean(1, keepdims=True)
+    G = np.einsum('kni,knj->kij', X, X) / n
+    cy, cd = np.einsum('kni,kn->ki', X, y) / n, np.einsum('kni,kn->ki', X, d) / n
+    full = np.ones((K, p), dtype=bool)
+
+    # Pre-test: keep the controls significant in the long regression of y on d and X
+    Z = np.concatenate([d[..., None], X], axis=2)
+    ZZ = np.einsum('kni,knj->kij', Z, Z)
+    coef = np.linalg.solve(ZZ, np.einsum('kni,kn->ki', Z, y)[..., None])[..., 0]
+    sigma2 = ((y - np.einsum('kni,ki->kn', Z, coef))**2).sum(1) / (n - p - 2)
+    t = coef[:, 1:] / np.sqrt(sigma2[:, None] * np.diagonal(np.linalg.inv(ZZ), axis1=1, axis2=2)[:, 1:])
+    significant = np.abs(t) > norm.ppf(1 - alpha / 2)
+
+    tables = {'Long': full, 'Short': ~full, 'Pre-test': significant}
+    tables = {name: partialled_ols(y, d, X, G, cy, cd, mask) for name, mask in tables.items()}
+    tables['Post-double'] = pds.fit(y, d, X).estimates_
+    return pd.concat(tables, names=['estimator', 'draw']).reset_index()
+
+
+def _simulate_cells(dgp, y: str, d: str, x: List[str], cells: List[dict], K: int, alpha: float, pds_params: dict):
+    """Simulates grid cells in sequence, warm-starting the lasso of every cell from the previous cell."""
+    pds = PostDoubleSelection(**pds_params)
+    tables = []
+    for cell in cells:
+        if hasattr(dgp, 'generate_arrays'):
+            arrays = dgp.generate_arrays(K=K, **cell)
+        else:
+            df = pd.concat([dgp.generate_data(seed=k, **cell) for k in range(K)])
+            arrays = {v: df[v].to_numpy(dtype=float).reshape(K, -1) for v in [y, d] + x}
+        Y, D, X = arrays[y], arrays[d], np.stack([arrays[v] for v in x], axis=-1)
+        table = _estimators(Y, D, X, pds, alpha)
+        for key, value in reversed(list(cell.items())):
+            table.insert(0, key, value)
+        tables.append(table)
+    return tables
+
+
+def pretest_simulation(dgp, y: str, d: str, x: List[str], grid: List[dict], K: int = 1000, alpha: float = 0.05,
+                       n_jobs: int = -1, **pds_params) -> pd.DataFrame:
+    """Long, short, pre-test and post-double-selection estimates of the effect of d on y over a grid of DGP parameters.
+
+    Every grid cell draws K datasets with seeds 0, ..., K-1 (e.g. dgp_pretest with N and b) and estimates all
+    draws at once. DGPs with a generate_arrays(K, **cell) method returning a dictionary of (K, N) arrays are
+    simulated without building dataframes. Cells are split into n_jobs contiguous chunks, processed in parallel.
+
+    Args:
+        dgp: data generating process with generate_data(seed, **cell) returning draws of the same size
+        y, d, x: outcome, treatment and control variables
+        grid: list of generate_data parameters, e.g. [{'N': 100, 'b': 0.3}, ...]
+        K: number of draws per cell
+        alpha: significance level of the pre-test
+        n_jobs: number of parallel jobs
+        pds_params: PostDoubleSelection parameters
+
+    Returns:
+        tidy dataframe with the cell parameters, estimator, draw, estimate, std_err and n_selected
+    """
+    n_chunks = min(len(grid), n_jobs if n_jobs > 0 else len(grid))
+    chunks = [list(chunk) for chunk in np.array_split(np.array(grid, dtype=object), n_chunks)]
+    tables = Parallel(n_jobs=n_jobs)(delayed(_simulate_cells)(dgp, y, d, x, chunk, K, alpha, pds_params) for chunk in chunks)
+    return pd.concat([t for chunk in tables for t in chunk], ignore_index=True)
@@ -0,0 +1,106 @@
+"""Per-stage wall time and memory profiling of data generating processes."""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def output_size(obj) -> int:
+    """Size in bytes of a stage output: deep memory usage of dataframes, buffer size of arrays."""
+    if obj is None:
+        return 0
+    if hasattr(obj, 'memory_usage'):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+
+class StageProfiler:
+    """Records wall time, allocated memory and output size of every stage of every draw.
+
+    Records are plain dictionaries, so that profilers filled in joblib workers can be sent back and merged
+    into the profiler of the main process. Every record carries the current tags (e.g. dgp and draw).
+    """
+
+    def __init__(self, memory: bool = True):
+        """Profiler setup
+
+        Args:
+            memory: trace allocations with tracemalloc (slows down the profiled code)
+        """
+        self.memory = memory
+        self.records = []
+        self.tags = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Profiles the enclosed block. The yielded record can be completed, e.g. with its output size."""
+        record = dict(self.tags, stage=name, pid=os.getpid())
+        started = self.memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - t0
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['allocated_bytes'] = current - before
+                record['peak_bytes'] = peak - before
+            if started:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    def call(self, name: str, func, *args, **kwargs):
+        """Calls func as a profiled stage and records the size of its output."""
+        with self.stage(name) as record:
+            out = func(*args, **kwargs)
+        record['output_bytes'] = output_size(out)
+        return out
+
+    def __add__(self, other: "StageProfiler") -> "StageProfiler":
+        profiler = StageProfiler(memory=self.memory)
+        profiler.records = self.records + other.records
+        return profiler
+
+    def to_frame(self):
+        """One row per stage and draw."""
+        import pandas as pd
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        """Total and average time, memory and output size per (dgp, stage), slowest first."""
+        df = self.to_frame()
+        keys = [k for k in ['dgp', 'stage'] if k in df.columns]
+        metrics = {'seconds': ['count', 'sum', 'mean', 'max']}
+        metrics.update({c: ['mean', 'max'] for c in ['allocated_bytes', 'peak_bytes', 'output_bytes'] if c in df.columns})
+        table = df.groupby(keys, sort=False).agg(metrics)
+        table.columns = [f"{c}_{s}" if c != 'seconds' or s != 'count' else 'draws' for c, s in table.columns]
+        table['time_share'] = table['seconds_sum'] / table['seconds_sum'].sum()
+        return table.sort_values('seconds_sum', ascending=False)
+
+    def to_json(self, path: str = None) -> str:
+        """Records as a JSON list, also written to path if provided."""
+        out = json.dumps(self.records, default=str)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(out)
+        return out
+
+
+def profiled_draw(dgp, f, seeds: dict, draw: int, memory: bool):
+    """Generates one draw and evaluates f on it inside a joblib worker, returning the result and the records."""
+    profiler = StageProfiler(memory=memory)
+    profiler.tags['draw'] = draw
+    df = dgp.generate_data(profiler=profiler, **seeds)
+    result = profiler.call('f', f, df)
+    return result, profiler.records
@@ -0,0 +1,201 @@
+"""Quantile regression over a grid of quantiles, by interior point on preprocessed data."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+
+
+def _step(x: np.ndarray, dx: np.ndarray) -> float:
+    """Largest step keeping x + step * dx non-negative."""
+    neg = dx < 0
+    return np.min(-x[neg] / dx[neg]) if neg.any() else 1e20
+
+
+def frisch_newton(X: np.ndarray, y: np.ndarray, tau: float, tol: float = 1e-6, max_iter: int = 50) -> np.ndarray:
+    """Quantile regression coefficients by the Frisch-Newton interior point method (Portnoy and Koenker, 1997).
+
+    Solves the dual linear program max y'a s.t. X'a = (1-tau) X'1, 0 <= a <= 1 with Mehrotra predictor-corrector
+    steps, a translation of lp.fnm from the R package quantreg. Every iteration solves one (p, p) system.
+
+    Args:
+        X: (n, p) regressors
+        y: (n,) outcome
+        tau: quantile
+        tol: tolerance on the duality gap
+        max_iter: maximum number of iterations
+
+    Returns:
+        (p,) coefficients
+    """
+    n = len(y)
+    c = -y
+    b = (1 - tau) * X.sum(0)
+    x = np.full(n, 1 - tau)
+    s = 1 - x
+    d = np.linalg.lstsq(X, c, rcond=None)[0]
+    r = c - X @ d
+    r = r + 0.001 * (r == 0)
+    z = np.maximum(r, 0)
+    w = z - r
+    gap = c @ x - d @ b + w.sum()
+    for _ in range(max_iter):
+        if gap <= tol:
+            break
+
+        # Affine scaling (predictor) step
+        q = 1 / (z / x + w / s)
+        r = z - w
+        M = (X * q[:, None]).T @ X
+        dd = np.linalg.solve(M, X.T @ (q * r))
+        dx = q * (X @ dd - r)
+        ds = -dx
+        dz = -z * (dx / x + 1)
+        dw = -w * (ds / s + 1)
+        fp = min(0.99995 * min(_step(x, dx), _step(s, ds)), 1)
+        fd = min(0.99995 * min(_step(w, dw), _step(z, dz)), 1)
+
+        # Centering (corrector) step
+        if min(fp, fd) < 1:
+            mu = z @ x + w @ s
+            g = (z + fd * dz) @ (x + fp * dx) + (w + fd * dw) @ (s + fp * ds)
+            mu = mu * (g / mu)**3 / (2 * n)
+            dxdz, dsdw = dx * dz, ds * dw
+            xinv, sinv = 1 / x, 1 / s
+            xi = mu * (xinv - sinv)
+            dd = np.linalg.solve(M, X.T @ (q * (r + dxdz - dsdw - xi)))
+            dx = q * (X @ dd + xi - r - dxdz + dsdw)
+            ds = -dx
+            dz = mu * xinv - z - xinv * z * dx - dxdz
+            dw = mu * sinv - w - sinv * w * ds - dsdw
+            fp = min(0.99995 * min(_step(x, dx), _step(s, ds)), 1)
+            fd = min(0.99995 * min(_step(w, dw), _step(z, dz)), 1)
+
+        x, s = x + fp * dx, s + fp * ds
+        d, w, z = d + fd * dd, w + fd * dw, z + fd * dz
+        gap = c @ x - d @ b + w.sum()
+    return -d
+
+
+def preprocessed_fit(X: np.ndarray, y: np.ndarray, tau: float, beta0: np.ndarray, band: np.ndarray, m: int,
+                     tol: float = 1e-6, max_fixups: int = 3) -> np.ndarray:
+    """Quantile regression solved on the m observations closest to a preliminary fit (Portnoy and Koenker, 1997).
+
+    Observations whose standardized residual from the preliminary fit beta0 is far below (above) the tau-th
+    quantile are collapsed into one aggregate observation below (above) the fit, and the reduced problem is
+    solved exactly. If some collapsed observations end up on the wrong side of the solution, they are put
+    back and the problem is solved again. The preliminary fit can be a subsample fit or the solution at a
+    neighboring quantile (warm start).
+
+    Args:
+        X: (n, p) regressors
+        y: (n,) outcome
+        tau: quantile
+        beta0: (p,) preliminary coefficients
+        band: (n,) scale of the prediction error of every observation
+        m: number of observations kept in the reduced problem
+
+    Returns:
+        (p,) coefficients, or None if too many observations had to be fixed up
+    """
+    n = len(y)
+    u = (y - X @ beta0) / band
+    kappa = np.quantile(u, [max(1 / n, tau - m / (2 * n)), min(tau + m / (2 * n), (n - 1) / n)])
+    below, above = u < kappa[0], u > kappa[1]
+    for _ in range(max_fixups + 1):
+        keep = ~below & ~above
+        Xr, yr = [X[keep]], [y[keep]]
+        for glob in [below, above]:
+            if glob.any():
+                Xr.append(X[glob].sum(0, keepdims=True))
+                yr.append([y[glob].sum()])
+        beta = frisch_newton(np.vstack(Xr), np.concatenate(yr), tau, tol=tol)
+        r = y - X @ beta
+        bad = (below & (r > 0)) | (above & (r < 0))
+        if not bad.any():
+            return beta
+        if bad.sum() > 0.1 * m:
+            return None
+        below, above = below & ~bad, above & ~bad
+    return None
+
+
+class QuantileRegression:
+    """Coefficient process of a linear quantile regression over a grid of quantiles.
+
+    Small problems are solved directly by interior point. For large n, the first quantile is fitted on a
+    random subsample and refined on the preprocessed full sample, and every following quantile is solved on
+    data preprocessed around the solution of the previous one. Bootstrap standard errors resample rows with
+    multinomial weights and warm-start every replication from the point estimates.
+    """
+
+    def __init__(self, quantiles: List[float] = None, subsample: int = None, n_boot: int = 0,
+                 tol: float = 1e-6, seed: int = 0):
+        """Quantile regression setup
+
+        Args:
+            quantiles: grid of quantiles, by default 0.01, ..., 0.99
+            subsample: size of the reduced problems, by default ((p+1) n)^(2/3)
+            n_boot: number of bootstrap replications for the standard errors
+            tol: tolerance on the duality gap of the interior point solver
+            seed: random seed
+        """
+        self.quantiles = np.arange(1, 100) / 100 if quantiles is None else np.sort(quantiles)
+        self.subsample = subsample
+        self.n_boot = n_boot
+        self.tol = tol
+        self.seed = seed
+
+    def _fit_quantile(self, X, y, tau, beta0, band, m, rng):
+        """Coefficients at one quantile, from a preliminary fit if provided."""
+        n = len(y)
+        while m < n:
+            if beta0 is None:
+                rows = rng.choice(n, m, replace=False)
+                beta0 = frisch_newton(X[rows], y[rows], tau, tol=self.tol)
+            beta = preprocessed_fit(X, y, tau, beta0, band, m, tol=self.tol)
+            if beta is not None:
+                return beta
+            m = 2 * m
+        return frisch_newton(X, y, tau, tol=self.tol)
+
+    def _path(self, X, y, band, m, rng, start=None):
+        """Coefficients over the quantile grid, each quantile warm-started from the previous one or from start."""
+        coefs = np.empty((len(self.quantiles), X.shape[1]))
+        for q, tau in enumerate(self.quantiles):
+            beta0 = start[q] if start is not None else coefs[q - 1] if q > 0 else None
+            coefs[q] = self._fit_quantile(X, y, tau, beta0, band, m, rng)
+        return coefs
+
+    def fit(self, X: pd.DataFrame, y: np.ndarray, add_constant: bool = True) -> "QuantileRegression":
+        """Fits the coefficient process.
+
+        Returns:
+            fitted model, with attributes coef_ and std_err_ (quantiles x regressors)
+        """
+        names = list(X.columns) if isinstance(X, pd.DataFrame) else [f"x{j}" for j in range(np.shape(X)[1])]
+        X = np.asarray(X, dtype=float)
+        if add_constant:
+            X, names = np.column_stack([np.ones(len(X)), X]), ['Intercept'] + names
+        n, p = X.shape
+
+        # Standardize the outcome so that the solver tolerance is scale free
+        y = np.asarray(y, dtype=float)
+        scale = np.std(y) or 1
+        y = y / scale
+        m = self.subsample or int(round(((p + 1) * n)**(2 / 3)))
+        band = np.sqrt(((X @ np.linalg.inv(np.linalg.cholesky(X.T @ X)).T)**2).sum(1))
+        rng = np.random.default_rng(self.seed)
+        coefs = self._path(X, y, band, m, rng)
+        index = pd.Index(self.quantiles, name='quantile')
+        self.coef_ = pd.DataFrame(coefs * scale, index=index, columns=names)
+
+        # Bootstrap, rescaling resampled rows by their multiplicity
+        if self.n_boot > 0:
+            boot = np.empty((self.n_boot,) + coefs.shape)
+            for b in range(self.n_boot):
+                weights = rng.multinomial(n, np.full(n, 1 / n)).astype(float)
+                rows = weights > 0
+                boot[b] = self._path(X[rows] * weights[rows, None], y[rows] * weights[rows], band[rows] * weights[rows],
+                                     m, rng, start=coefs)
+            self.std_err_ = pd.DataFrame(boot.std(0, ddof=1) * scale, index=index, columns=names)
+        return self
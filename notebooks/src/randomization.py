@@ -0,0 +1,137 @@
+"""Exact randomization tests by enumeration of all assignments in revolving-door order."""
+
+import numpy as np
+import pandas as pd
+from math import comb
+from joblib import Parallel, delayed
+
+CACHE_SIZE = 1 << 14
+
+
+def revolving_door_unrank(n: int, k: int, r: int) -> np.ndarray:
+    """Treated units (0-based) of the r-th assignment of k out of n units in revolving-door order.
+
+    The order is defined recursively as R(n, k) = R(n-1, k) followed by R(n-1, k-1) reversed, with unit n-1 added.
+    """
+    units = []
+    while 0 < k < n:
+        first = comb(n - 1, k)
+        if r >= first:
+            units.append(n - 1)
+            r = comb(n - 1, k - 1) - 1 - (r - first)
+            k -= 1
+        n -= 1
+    units.extend(range(k))
+    return np.sort(np.array(units, dtype=int))
+
+
+class _Deltas:
+    """Changes of the treated outcome sum y[in] - y[out] between consecutive assignments in revolving-door order.
+
+    Every step swaps one unit in and one unit out. The swap sequence of R(n, k) is the sequence of R(n-1, k),
+    the swap between the two halves (unit n-1 in, unit k-2 out, or unit n-2 out if k = 1), and the sequence of
+    R(n-1, k-1) reversed with swaps inverted. Short sequences are cached and long ones are assembled from them.
+    """
+
+    def __init__(self, y: np.ndarray):
+        self.y = y
+        self.cache = {}
+
+    def full(self, n: int, k: int) -> np.ndarray:
+        if k == 0 or k == n:
+            return np.zeros(0)
+        if (n, k) not in self.cache:
+            out = n - 2 if k == 1 else k - 2
+            self.cache[(n, k)] = np.concatenate([self.full(n - 1, k), [self.y[n - 1] - self.y[out]], -self.full(n - 1, k - 1)[::-1]])
+        return self.cache[(n, k)]
+
+    def range(self, n: int, k: int, lo: int, hi: int) -> np.ndarray:
+        """Steps lo, ..., hi-1, step t going from assignment t to assignment t+1."""
+        if lo >= hi:
+            return np.zeros(0)
+        if comb(n, k) <= CACHE_SIZE:
+            return self.full(n, k)[lo:hi]
+        first = comb(n - 1, k)
+        parts = []
+        if lo < first - 1:
+            parts.append(self.range(n - 1, k, lo, min(hi, first - 1)))
+        if lo <= first - 1 < hi:
+            out = n - 2 if k == 1 else k - 2
+            parts.append([self.y[n - 1] - self.y[out]])
+        if hi > first:
+            L = comb(n - 1, k - 1) - 1
+            a, b = max(lo, first) - first, hi - first
+            parts.append(-self.range(n - 1, k - 1, L - b, L - a)[::-1])
+        return np.concatenate(parts)
+
+
+def _treated_sums_range(y: np.ndarray, k: int, lo: int, hi: int) -> np.ndarray:
+    """Treated outcome sums of assignments lo, ..., hi-1, updated in O(1) from one assignment to the next."""
+    start = y[revolving_door_unrank(len(y), k, lo)].sum()
+    return start + np.concatenate([[0], np.cumsum(_Deltas(y).range(len(y), k, lo, hi - 1))])
+
+
+def _count_extreme(y: np.ndarray, k: int, lo: int, hi: int, observed: float, alternative: str) -> int:
+    n = len(y)
+    stats = _treated_sums_range(y, k, lo, hi) * (1 / k + 1 / (n - k)) - y.sum() / (n - k)
+    return int(_extreme(stats, observed, alternative).sum())
+
+
+def _extreme(stats: np.ndarray, observed: float, alternative: str) -> np.ndarray:
+    """Statistics at least as extreme as the observed one, with a tolerance for rounding errors."""
+    tol = 1e-9 * (1 + abs(observed))
+    if alternative == 'greater':
+        return stats >= observed - tol
+    if alternative == 'less':
+        return stats <= observed + tol
+    return np.abs(stats) >= abs(observed) - tol
+
+
+def randomization_test(y: np.ndarray,
+                       d: np.ndarray,
+                       alternative: str = 'two-sided',
+                       max_exact: float = 1e9,
+                       n_draws: int = 100_000,
+                       chunk_size: int = 1 << 22,
+                       n_jobs: int = -1,
+                       seed: int = 0,
+                       ) -> pd.Series:
+    """Fisher randomization test of the sharp null of no effect, with the difference in means as statistic.
+
+    If there are at most max_exact assignments with the observed number of treated units, all of them are
+    enumerated in revolving-door order: consecutive assignments differ by one swap, so that the treated
+    outcome sum is updated in O(1). The enumeration is split in chunks of chunk_size assignments, each
+    starting from its unranked first assignment, and processed in parallel. Otherwise, the p-value is
+    estimated on n_draws random assignments.
+
+    Args:
+        y: (n,) outcomes
+        d: (n,) binary treatment assignments
+        alternative: 'two-sided', 'greater' or 'less'
+        max_exact: maximum number of assignments for exact enumeration
+        n_draws: number of random assignments for the Monte Carlo test
+        chunk_size: number of assignments per parallel job
+        n_jobs: number of parallel jobs
+        seed: random seed of the Monte Carlo test
+
+    Returns:
+        series with estimate, p_value, n_assignments and method
+    """
+    y, d = np.asarray(y, dtype=float), np.asarray(d).astype(bool)
+    n, k = len(y), int(d.sum())
+    observed = y[d].mean() - y[~d].mean()
+    total = comb(n, k)
+
+    if total <= max_exact:
+        ranges = [(lo, min(lo + chunk_size, total)) for lo in range(0, total, chunk_size)]
+        counts = Parallel(n_jobs=n_jobs)(delayed(_count_extreme)(y, k, lo, hi, observed, alternative) for lo, hi in ranges)
+        p_value, n_assignments, method = sum(counts) / total, total, 'exact'
+    else:
+        rng = np.random.default_rng(seed)
+        count = 0
+        for size in np.diff(np.append(np.arange(0, n_draws, max(1, chunk_size // n)), n_draws)):
+            treated = np.argsort(rng.random((size, n)), axis=1)[:, :k]
+            stats = y[treated].sum(1) * (1 / k + 1 / (n - k)) - y.sum() / (n - k)
+            count += _extreme(stats, observed, alternative).sum()
+        p_value, n_assignments, method = (count + 1) / (n_draws + 1), n_draws, 'monte carlo'
+    return pd.Series({'estimate': observed, 'p_value': p_value, 'n_assignments': n_assignments, 'method': method})
@@ -0,0 +1,155 @@
+"""Omitted variable bias sensitivity analysis with partial R-squared (Cinelli and Hazlett, 2020), for many coefficients at once."""
+
+import numpy as np
+import pandas as pd
+from typing import List
+from scipy.stats import t as student_t
+
+
+def partial_r2(t_value: np.ndarray, dof: np.ndarray) -> np.ndarray:
+    """Partial R-squared of a regressor with the outcome, from its t-value."""
+    return t_value**2 / (t_value**2 + dof)
+
+
+def robustness_value(t_value: np.ndarray, dof: np.ndarray, q: float = 1, alpha: float = 1) -> np.ndarray:
+    """Minimum partial R-squared of a confounder with both treatment and outcome that reduces the estimate by 100q%
+    (alpha = 1), or makes the reduced estimate not significant at level alpha."""
+    fq = q * np.abs(t_value / np.sqrt(dof))
+    f_crit = np.abs(student_t.ppf(alpha / 2, dof - 1)) / np.sqrt(dof - 1)
+    fqa = fq - f_crit
+    rv = np.where(fqa > 0, 0.5 * (np.sqrt(fqa**4 + 4 * fqa**2) - fqa**2), 0)
+    with np.errstate(divide='ignore'):
+        extreme = (fqa > 0) & (fq > 1 / f_crit)
+    return np.where(extreme, (fq**2 - f_crit**2) / (1 + fq**2), rv)
+
+
+def adjusted_estimates(estimate: np.ndarray, std_err: np.ndarray, dof: np.ndarray, r2dz_x: np.ndarray,
+                       r2yz_dx: np.ndarray, reduce: bool = True):
+    """Bias-adjusted estimates, standard errors and t-values, broadcasting coefficients against confounder strengths.
+
+    Args:
+        estimate, std_err, dof: estimates of the short regression
+        r2dz_x: partial R-squared of the confounder with the treatment
+        r2yz_dx: partial R-squared of the confounder with the outcome
+        reduce: the bias reduces the absolute value of the estimate
+
+    Returns:
+        three arrays of adjusted estimates, standard errors and t-values
+    """
+    bias = std_err * np.sqrt(dof * r2yz_dx * r2dz_x / (1 - r2dz_x))
+    adjusted = estimate - np.sign(estimate) * bias if reduce else estimate + np.sign(estimate) * bias
+    adjusted_se = std_err * np.sqrt((1 - r2yz_dx) / (1 - r2dz_x) * dof / (dof - 1))
+    return adjusted, adjusted_se, adjusted / adjusted_se
+
+
+def benchmark_bounds(r2dxj_x: np.ndarray, r2yxj_dx: np.ndarray, kd: np.ndarray, ky: np.ndarray = None):
+    """Partial R-squared of a confounder kd (ky) times as strong as a benchmark covariate with the treatment (outcome).
+
+    Args:
+        r2dxj_x: partial R-squared of the benchmark covariate with the treatment
+        r2yxj_dx: partial R-squared of the benchmark covariate with the outcome
+        kd, ky: multiples of the benchmark strength, ky = kd by default
+
+    Returns:
+        r2dz_x, r2yz_dx bounds
+    """
+    kd = np.asarray(kd, dtype=float)
+    ky = kd if ky is None else np.asarray(ky, dtype=float)
+    r2dz_x = kd * r2dxj_x / (1 - r2dxj_x)
+    r2zxj_xd = kd * r2dxj_x**2 / ((1 - kd * r2dxj_x) * (1 - r2dxj_x))
+    r2yz_dx = ((np.sqrt(ky) + np.sqrt(r2zxj_xd)) / np.sqrt(1 - r2zxj_xd))**2 * r2yxj_dx / (1 - r2yxj_dx)
+    return r2dz_x, np.minimum(r2yz_dx, 1)
+
+
+def _t_values(Z: np.ndarray, Y: np.ndarray):
+    """OLS coefficients, standard errors and t-values of Y (n, m) on Z (n, k), as (k, m) arrays, and dof."""
+    n, k = Z.shape
+    ZZ_inv = np.linalg.inv(Z.T @ Z)
+    coef = ZZ_inv @ Z.T @ Y
+    sigma2 = ((Y - Z @ coef)**2).sum(0) / (n - k)
+    std_err = np.sqrt(np.outer(np.diag(ZZ_inv), sigma2))
+    return coef, std_err, coef / std_err, n - k
+
+
+def ovb_sensitivity(df: pd.DataFrame,
+                    outcomes: List[str],
+                    treatments: List[str],
+                    covariates: List[str],
+                    benchmark: str = None,
+                    kd: List[float] = [1, 2, 3],
+                    ky: List[float] = None,
+                    q: float = 1,
+                    alpha: float = 0.05,
+                    ) -> pd.DataFrame:
+    """Sensitivity statistics of the coefficients of every treatment in the regressions of every outcome on all
+    treatments and covariates (with intercept), estimated together since they share the same regressors.
+
+    Args:
+        df: data
+        outcomes: outcome variables
+        treatments: treatment variables
+        covariates: control variables, categorical ones are one-hot encoded
+        benchmark: covariate used to bound the strength of the confounder, kd and ky times as strong
+        q: share of the estimate that the confounder would explain, for the robustness values
+        alpha: significance level of the robustness value rv_qa
+
+    Returns:
+        dataframe indexed by (outcome, treatment) with estimate, std_err, t_value, dof, r2yd_x, rv_q, rv_qa,
+        and r2dz_x_<k>, r2yz_dx_<k>, adjusted_estimate_<k>, adjusted_t_<k> for every benchmark multiple k
+    """
+    X = pd.get_dummies(df[covariates], drop_first=True, dtype=float)
+    Z = np.column_stack([df[treatments].to_numpy(dtype=float), np.ones(len(df)), X.to_numpy()])
+    Y = df[outcomes].to_numpy(dtype=float)
+    k = len(treatments)
+    coef, std_err, t_value, dof = _t_values(Z, Y)
+    index = pd.MultiIndex.from_product([outcomes, treatments], names=['outcome', 'treatment'])
+    table = pd.DataFrame({'estimate': coef[:k].T.ravel(), 'std_err': std_err[:k].T.ravel(),
+                          't_value': t_value[:k].T.ravel(), 'dof': dof}, index=index)
+    table['r2yd_x'] = partial_r2(table['t_value'], dof)
+    table['rv_q'] = robustness_value(table['t_value'], dof, q=q)
+    table['rv_qa'] = robustness_value(table['t_value'], dof, q=q, alpha=alpha)
+
+    # Bounds from the benchmark covariate: partial R2 with each treatment (given the other regressors) and each outcome
+    if benchmark is not None:
+        if benchmark not in X.columns:
+            raise ValueError(f"Benchmark {benchmark} must be a numeric covariate or a dummy column in {list(X.columns)}")
+        j = k + 1 + X.columns.get_loc(benchmark)
+        r2yxj_dx = partial_r2(t_value[j], dof)
+        r2dxj_x = np.empty(k)
+        for i in range(k):
+            _, _, t_d, dof_d = _t_values(np.delete(Z, i, axis=1), Z[:, [i]])
+            r2dxj_x[i] = partial_r2(t_d[j - 1, 0], dof_d)
+        for kd_m, ky_m in zip(kd, kd if ky is None else ky):
+            r2dz_x, r2yz_dx = benchmark_bounds(np.tile(r2dxj_x, len(outcomes)), np.repeat(r2yxj_dx, k), kd_m, ky_m)
+            adjusted, _, adjusted_t = adjusted_estimates(table['estimate'].values, table['std_err'].values, dof, r2dz_x, r2yz_dx)
+            label = f"{kd_m:g}" if ky is None else f"{kd_m:g}_{ky_m:g}"
+            table[f'r2dz_x_{label}'], table[f'r2yz_dx_{label}'] = r2dz_x, r2yz_dx
+            table[f'adjusted_estimate_{label}'], table[f'adjusted_t_{label}'] = adjusted, adjusted_t
+    return table
+
+
+def sensitivity_grid(table: pd.DataFrame, r2dz_x: np.ndarray = None, r2yz_dx: np.ndarray = None, reduce: bool = True) -> pd.DataFrame:
+    """Bias-adjusted estimates and t-values of every coefficient over a 2-D grid of confounder strengths, in one broadcast.
+
+    Args:
+        table: output of ovb_sensitivity (or any table with estimate, std_err and dof columns)
+        r2dz_x: grid of partial R-squared of the confounder with the treatment, by default 0, 0.01, ..., 0.99
+        r2yz_dx: grid of partial R-squared of the confounder with the outcome, by default the same
+
+    Returns:
+        tidy dataframe with the table index, r2dz_x, r2yz_dx, adjusted_estimate, adjusted_std_err and adjusted_t,
+        ready to be pivoted into contour plots
+    """
+    r2dz_x = np.arange(100) / 100 if r2dz_x is None else np.asarray(r2dz_x, dtype=float)
+    r2yz_dx = r2dz_x if r2yz_dx is None else np.asarray(r2yz_dx, dtype=float)
+    shape = (len(table), len(r2dz_x), len(r2yz_dx))
+    est, se, dof = [table[c].to_numpy(dtype=float)[:, None, None] for c in ['estimate', 'std_err', 'dof']]
+    adjusted, adjusted_se, adjusted_t = adjusted_estimates(est, se, dof, r2dz_x[None, :, None], r2yz_dx[None, None, :], reduce)
+    grid = pd.DataFrame({
+        'r2dz_x': np.broadcast_to(r2dz_x[None, :, None], shape).ravel(),
+        'r2yz_dx': np.broadcast_to(r2yz_dx[None, None, :], shape).ravel(),
+        'adjusted_estimate': adjusted.ravel(),
+        'adjusted_std_err': np.broadcast_to(adjusted_se, shape).ravel(),
+        'adjusted_t': adjusted_t.ravel(),
+    }, index=table.index.repeat(shape[1] * shape[2]))
+    return grid.reset_index()
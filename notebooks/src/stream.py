@@ -0,0 +1,140 @@
+"""Asynchronous rate-controlled stream of events generated by a DGP."""
+
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+from .dgp import DGP
+
+# DGP stages seed and draw from the global np.random state, so that they must never run concurrently
+_DGP_LOCK = threading.Lock()
+
+
+class EventStream:
+    """Turns a DGP into an asynchronous stream of row batches, consumed with `async for batch in stream`.
+
+    Events are generated in blocks of dgp.n rows by a background thread, one generate_data call per block, and
+    every block gets arrival times from the arrival process. At most max_blocks blocks wait in a bounded queue,
+    so that generation pauses when the consumer falls behind (backpressure). Batches are released at their
+    scheduled arrival time: if the consumer is late, they are released immediately until it catches up.
+    With assign_at_arrival, blocks only contain baseline variables and potential outcomes, and the treatment
+    is assigned (and outcomes realized) batch by batch at release time, e.g. for adaptive designs.
+
+    Since DGPs draw from the global np.random state, all DGP calls (block generation and assignment) run in
+    worker threads one at a time, under a lock shared by all streams. For the same seed to give the same data,
+    consumers must not use the global np.random state while iterating.
+    """
+
+    def __init__(self,
+                 dgp: DGP,
+                 rate: float = None,
+                 arrival='poisson',
+                 batch_size: int = 1_000,
+                 n_events: int = None,
+                 max_blocks: int = 2,
+                 assign_at_arrival: bool = False,
+                 drop_unobservables: bool = True,
+                 seed: int = 0,
+                 ):
+        """Stream setup
+
+        Args:
+            dgp: data generating process, generating dgp.n events per block
+            rate: average number of events per second, None for no rate control
+            arrival: 'poisson' (exponential inter-arrival times), 'uniform' (constant inter-arrival times), or
+                function (rng, size, rate) -> inter-arrival times in seconds
+            batch_size: number of events per batch
+            n_events: total number of events, None for an endless stream
+            max_blocks: maximum number of generated blocks waiting to be streamed
+            assign_at_arrival: assign the treatment when batches are released rather than when blocks are generated
+            drop_unobservables: drop potential outcomes and unobservable variables
+            seed: random seed
+        """
+        self.dgp = dgp
+        self.rate = rate
+        self.arrival = arrival
+        self.batch_size = batch_size
+        self.n_events = n_events
+        self.max_blocks = max_blocks
+        self.assign_at_arrival = assign_at_arrival
+        self.drop_unobservables = drop_unobservables
+        self.seed = seed
+
+    def _gaps(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Inter-arrival times in seconds."""
+        if self.rate is None:
+            return np.zeros(size)
+        if self.arrival == 'poisson':
+            return rng.exponential(1 / self.rate, size)
+        if self.arrival == 'uniform':
+            return np.full(size, 1 / self.rate)
+        return np.asarray(self.arrival(rng, size, self.rate), dtype=float)
+
+    def _block(self, b: int, start: float) -> pd.DataFrame:
+        """Block b of events with arrival times, starting at time start. Runs in a worker thread."""
+        s = self.seed + 4 * b
+        with _DGP_LOCK:
+            if self.assign_at_arrival:
+                df = self.dgp.initialize_data(seed=s)
+                df = self.dgp.add_potential_outcomes(df=df, seed=s + 1)
+            else:
+                df = self.dgp.generate_data(seed_dt=s, seed_po=s + 1, seed_as=s + 2, seed_pt=s + 3,
+                                            drop_unobservables=self.drop_unobservables)
+        df = df.reset_index(drop=True)
+        df.index += b * len(df)
+        df['arrival_time'] = start + np.cumsum(self._gaps(np.random.default_rng([self.seed, b]), len(df)))
+        return df
+
+    def _assign(self, batch: pd.DataFrame, k: int) -> pd.DataFrame:
+        """Assigns the treatment to batch k and realizes its outcomes. Runs in a worker thread."""
+        s = self.seed + 4 * k
+        with _DGP_LOCK:
+            batch = self.dgp.add_treatment_assignment(df=batch, seed=s + 2)
+            self.dgp.check_potential_outcomes(df=batch)
+            batch = self.dgp.add_realized_outcomes(batch, drop_unobservables=self.drop_unobservables)
+            return self.dgp.post_treatment_processing(df=batch, seed=s + 3)
+
+    async def _produce(self, queue: asyncio.Queue):
+        """Generates blocks in a thread and queues them, waiting while the queue is full. An exception raised by
+        the generation is queued in place of the block, to be raised to the consumer."""
+        loop = asyncio.get_running_loop()
+        b, start = 0, 0.0
+        while True:
+            try:
+                block = await loop.run_in_executor(None, self._block, b, start)
+            except Exception as e:
+                await queue.put(e)
+                return
+            start = block['arrival_time'].iloc[-1]
+            await queue.put(block)
+            b += 1
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.max_blocks)
+        producer = asyncio.create_task(self._produce(queue))
+        t0, emitted, k = loop.time(), 0, 0
+        try:
+            while self.n_events is None or emitted < self.n_events:
+                block = await queue.get()
+                if isinstance(block, Exception):
+                    raise block
+                for i in range(0, len(block), self.batch_size):
+                    size = self.batch_size if self.n_events is None else min(self.batch_size, self.n_events - emitted)
+                    if size <= 0:
+                        break
+                    batch = block.iloc[i:i + size]
+                    delay = t0 + batch['arrival_time'].iloc[-1] - loop.time()
+                    if self.rate is not None and delay > 0:
+                        await asyncio.sleep(delay)
+                    if self.assign_at_arrival:
+                        batch = await loop.run_in_executor(None, self._assign, batch.copy(), k)
+                    emitted += len(batch)
+                    k += 1
+                    yield batch
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
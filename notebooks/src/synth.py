@@ -0,0 +1,112 @@
+"""Synthetic control weights for a treated unit and all its placebos, solved together."""
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+
+def simplex_projection(V: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Euclidean projection of every column of V onto the simplex of the entries allowed by mask.
+
+    Args:
+        V: (J, K) matrix
+        mask: (J, K) boolean matrix, False entries are forced to zero
+
+    Returns:
+        (J, K) matrix with non-negative columns summing to one
+    """
+    U = -np.sort(-np.where(mask, V, -np.inf), axis=0)
+    with np.errstate(invalid='ignore'):
+        cssv = np.cumsum(U, axis=0) - 1
+        positive = U - cssv / np.arange(1, len(V) + 1)[:, None] > 0
+    rho = len(V) - 1 - np.argmax(positive[::-1], axis=0)
+    theta = cssv[rho, np.arange(V.shape[1])] / (rho + 1)
+    return np.where(mask, np.maximum(V - theta, 0), 0)
+
+
+def solve_weights(gram: np.ndarray, targets: np.ndarray, W0: np.ndarray = None,
+                  max_iter: int = 10_000, tol: float = 1e-10) -> np.ndarray:
+    """Simplex-constrained least squares weights of the donors of every target unit.
+
+    Each target unit j is approximated by a convex combination of all other units. Since the objective of
+    unit j only depends on the Gram matrix of the pre-treatment outcomes, all problems share it and are
+    solved together by accelerated projected gradient (FISTA), one matrix product per iteration.
+
+    Args:
+        gram: (J, J) Gram matrix Y'Y of the pre-treatment outcomes of all units
+        targets: indices of the K target units
+        W0: (J, K) initial weights (warm start), uniform over donors by default
+        max_iter: maximum number of iterations
+        tol: tolerance on the largest change in weights
+
+    Returns:
+        (J, K) matrix of weights, with zero weight of every target unit on itself
+    """
+    J, K = len(gram), len(targets)
+    mask = np.ones((J, K), dtype=bool)
+    mask[targets, np.arange(K)] = False
+    W = mask / mask.sum(0) if W0 is None else simplex_projection(W0, mask)
+    step = 1 / np.linalg.eigvalsh(gram)[-1]
+    Z, t = W, 1
+    for _ in range(max_iter):
+        W_new = simplex_projection(Z - step * (gram @ Z - gram[:, targets]), mask)
+        t_new = (1 + np.sqrt(1 + 4 * t**2)) / 2
+        Z = W_new + (t - 1) / t_new * (W_new - W)
+        converged = np.abs(W_new - W).max() < tol
+        W, t = W_new, t_new
+        if converged:
+            break
+    return W
+
+
+class SyntheticControl:
+    """Synthetic control estimates for every unit of a panel, for placebo inference.
+
+    The weights of all units are solved together from one Gram matrix, split in n_jobs batches of units
+    solved in parallel. Refitting with warm_start=True starts from the previous weights, e.g. when moving
+    the treatment date or adding periods.
+    """
+
+    def __init__(self, max_iter: int = 10_000, tol: float = 1e-10, n_jobs: int = 1, warm_start: bool = False):
+        self.max_iter = max_iter
+        self.tol = tol
+        self.n_jobs = n_jobs
+        self.warm_start = warm_start
+        self.weights_ = None
+
+    def fit(self, Y: pd.DataFrame, treatment_time) -> "SyntheticControl":
+        """Fits synthetic controls for every unit.
+
+        Args:
+            Y: wide dataframe of outcomes, indexed by time, with one column per unit
+            treatment_time: first treated period, earlier periods are used to fit the weights
+
+        Returns:
+            fitted model, with attributes weights_ (donor x unit), synthetic_ and gaps_ (time x unit)
+        """
+        self.pre = np.asarray(Y.index < treatment_time)
+        Y_pre = Y.to_numpy(dtype=float)[self.pre]
+        gram = Y_pre.T @ Y_pre
+        J = Y.shape[1]
+        W0 = self.weights_.to_numpy() if self.warm_start and self.weights_ is not None else None
+        batches = np.array_split(np.arange(J), max(1, min(self.n_jobs, J)))
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(solve_weights)(gram, b, None if W0 is None else W0[:, b], self.max_iter, self.tol) for b in batches)
+        self.weights_ = pd.DataFrame(np.hstack(results), index=Y.columns, columns=Y.columns)
+        self.synthetic_ = Y @ self.weights_
+        self.gaps_ = Y - self.synthetic_
+        return self
+
+    def placebo_test(self, treated) -> pd.DataFrame:
+        """Placebo inference on the ratio of post- to pre-treatment mean squared gaps.
+
+        Returns:
+            dataframe with the pre- and post-treatment MSE and their ratio for every unit, sorted by ratio,
+            with attribute p_value: the share of units with a ratio at least as large as the treated one
+        """
+        gaps2 = self.gaps_.to_numpy()**2
+        table = pd.DataFrame({'mse_pre': gaps2[self.pre].mean(0), 'mse_post': gaps2[~self.pre].mean(0)},
+                             index=self.gaps_.columns)
+        table['ratio'] = table['mse_post'] / table['mse_pre']
+        table.attrs['p_value'] = np.mean(table['ratio'] >= table.loc[treated, 'ratio'])
+        return table.sort_values('ratio', ascending=False)
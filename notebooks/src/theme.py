@@ -1,58 +1,64 @@
 
 # Import libraries
+import warnings
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Remove warnings
-import warnings
-warnings.filterwarnings('ignore')
+# Palette
+palette = ['#003f5c', '#ff6e54', '#2db88b', '#003f5c', '#ff6e54', '#2db88b', '#003f5c', '#ff6e54', '#2db88b', '#003f5c']
 
-# Plot settings
-#plt.style.use('seaborn')
-sns.set_theme(style="ticks")
-mpl.rcParams['figure.figsize'] = (10, 6)
 
-# Theme
-palette = ['#003f5c', '#ff6e54', '#2db88b', '#003f5c', '#ff6e54', '#2db88b', '#003f5c', '#ff6e54', '#2db88b', '#003f5c']
-mpl.rcParams['axes.prop_cycle'] = mpl.cycler(color=palette) 
-
-# Title
-mpl.rcParams['figure.titlesize'] = 22
-mpl.rcParams['figure.titleweight'] = 'bold'
-mpl.rcParams['axes.titlesize'] = 22
-mpl.rcParams['axes.titleweight'] = 'bold'
-mpl.rcParams['axes.titlepad'] = 20
-
-# Axes labels
-mpl.rcParams['axes.labelsize'] = 16
-mpl.rcParams['axes.labelweight'] = 'bold'
-
-# Grid and thicks
-mpl.rcParams['axes.spines.right'] = False
-mpl.rcParams['axes.spines.left'] = False
-mpl.rcParams['axes.spines.top'] = False
-mpl.rcParams['axes.spines.right'] = False
-mpl.rcParams['axes.grid'] = True
-mpl.rcParams['axes.grid.axis'] = 'y'
-#mpl.rcParams['axes.xmargin'] = 0
-mpl.rcParams['ytick.left'] = False
-
-# Legend
-mpl.rcParams['legend.facecolor'] = 'w'
-mpl.rcParams['legend.title_fontsize'] = 14
-mpl.rcParams['legend.fontsize'] = 12
-mpl.rcParams['legend.frameon'] = True
-mpl.rcParams['legend.framealpha'] = 1
-mpl.rcParams['legend.fancybox'] = True
-mpl.rcParams['legend.facecolor'] = 'white'
-mpl.rcParams['legend.edgecolor'] = 'gray'
-mpl.rcParams['legend.borderpad'] = 0.6
-
-# Other
-mpl.rcParams['lines.linewidth'] = 4
-mpl.rcParams['lines.markersize'] = 10
-mpl.rcParams['scatter.edgecolors'] = 'none'
-mpl.rcParams['patch.edgecolor'] = 'none'
+def apply_theme():
+    """Sets the blog plot theme in matplotlib and silences warnings."""
+    warnings.filterwarnings('ignore')
+
+    # Plot settings
+    #plt.style.use('seaborn')
+    sns.set_theme(style="ticks")
+    mpl.rcParams['figure.figsize'] = (10, 6)
+
+    # Theme
+    mpl.rcParams['axes.prop_cycle'] = mpl.cycler(color=palette) 
+
+    # Title
+    mpl.rcParams['figure.titlesize'] = 22
+    mpl.rcParams['figure.titleweight'] = 'bold'
+    mpl.rcParams['axes.titlesize'] = 22
+    mpl.rcParams['axes.titleweight'] = 'bold'
+    mpl.rcParams['axes.titlepad'] = 20
+
+    # Axes labels
+    mpl.rcParams['axes.labelsize'] = 16
+    mpl.rcParams['axes.labelweight'] = 'bold'
+
+    # Grid and thicks
+    mpl.rcParams['axes.spines.right'] = False
+    mpl.rcParams['axes.spines.left'] = False
+    mpl.rcParams['axes.spines.top'] = False
+    mpl.rcParams['axes.spines.right'] = False
+    mpl.rcParams['axes.grid'] = True
+    mpl.rcParams['axes.grid.axis'] = 'y'
+    #mpl.rcParams['axes.xmargin'] = 0
+    mpl.rcParams['ytick.left'] = False
+
+    # Legend
+    mpl.rcParams['legend.facecolor'] = 'w'
+    mpl.rcParams['legend.title_fontsize'] = 14
+    mpl.rcParams['legend.fontsize'] = 12
+    mpl.rcParams['legend.frameon'] = True
+    mpl.rcParams['legend.framealpha'] = 1
+    mpl.rcParams['legend.fancybox'] = True
+    mpl.rcParams['legend.facecolor'] = 'white'
+    mpl.rcParams['legend.edgecolor'] = 'gray'
+    mpl.rcParams['legend.borderpad'] = 0.6
+
+    # Other
+    mpl.rcParams['lines.linewidth'] = 4
+    mpl.rcParams['lines.markersize'] = 10
+    mpl.rcParams['scatter.edgecolors'] = 'none'
+    mpl.rcParams['patch.edgecolor'] = 'none'
 
 
+# Importing the theme applies it, as in `from src.theme import *`
+apply_theme()
@@ -0,0 +1,95 @@
+"""Qini, uplift and policy gain curves for many uplift models at once."""
+
+import numpy as np
+import pandas as pd
+
+
+def _curves(order: np.ndarray, y: np.ndarray, d: np.ndarray, w: np.ndarray, k: np.ndarray, cost: float):
+    """Qini, uplift and policy gain curves at the cutoffs k, for observations sorted by order and weights w.
+
+    Args:
+        order: (n,) descending order of the scores
+        y, d: (n,) outcomes and treatment assignments
+        w: (B, n) observation weights
+        k: number of targeted observations at every point of the curve
+
+    Returns:
+        three (B, len(k)) arrays
+    """
+    y, d, w = y[order], d[order], w[:, order]
+    n1 = np.cumsum(w * d, axis=1)[:, k - 1]
+    n0 = np.cumsum(w * (1 - d), axis=1)[:, k - 1]
+    y1 = np.cumsum(w * d * y, axis=1)[:, k - 1]
+    y0 = np.cumsum(w * (1 - d) * y, axis=1)[:, k - 1]
+    n = n1 + n0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        qini = y1 - y0 * n1 / n0
+        effect = y1 / n1 - y0 / n0
+    uplift = effect * n / w.sum(1, keepdims=True)
+    gain = (effect - cost) * n
+    return qini, uplift, gain
+
+
+def uplift_curves(scores: np.ndarray,
+                  y: np.ndarray,
+                  d: np.ndarray,
+                  names: list = None,
+                  cost: float = 0,
+                  tau: np.ndarray = None,
+                  n_points: int = 100,
+                  n_boot: int = 0,
+                  alpha: float = 0.05,
+                  seed: int = 0,
+                  ) -> pd.DataFrame:
+    """Qini, uplift and cost-aware policy gain curves of many models, targeting units by decreasing score.
+
+    Each model needs one argsort of its scores; all curves then come from cumulative sums of treated and control
+    outcomes and counts. Bootstrap bands reuse the same sort order with a (n_boot, n) matrix of Poisson weights.
+
+    Args:
+        scores: (models, n) predicted treatment effects
+        y: (n,) outcomes
+        d: (n,) treatment assignments
+        names: model names
+        cost: cost of treating one unit, for the policy gain
+        tau: (n,) true treatment effects, to also compute the oracle policy gain
+        n_points: number of points of the curves
+        n_boot: number of bootstrap replications for the confidence bands
+        alpha: the bands are the alpha/2 and 1-alpha/2 bootstrap quantiles
+        seed: random seed
+
+    Returns:
+        tidy dataframe with columns model, fraction, qini, uplift, gain (and oracle_gain, *_lower and *_upper)
+    """
+    scores = np.atleast_2d(scores)
+    y, d = np.asarray(y, dtype=float), np.asarray(d, dtype=float)
+    M, n = scores.shape
+    names = list(range(M)) if names is None else names
+    fraction = np.linspace(0, 1, n_points + 1)[1:]
+    k = np.maximum(np.ceil(fraction * n).astype(int), 1)
+    weights = np.ones((1, n))
+    if n_boot > 0:
+        weights = np.vstack([weights, np.random.default_rng(seed).poisson(1, (n_boot, n))])
+
+    orders = np.argsort(-scores, axis=1, kind='stable')
+    tables = []
+    for m in range(M):
+        qini, uplift, gain = _curves(orders[m], y, d, weights, k, cost)
+        table = pd.DataFrame({'model': names[m], 'fraction': fraction, 'qini': qini[0], 'uplift': uplift[0], 'gain': gain[0]})
+        if tau is not None:
+            table['oracle_gain'] = np.cumsum(np.asarray(tau)[orders[m]] - cost)[k - 1]
+        if n_boot > 0:
+            for name, curve in zip(['qini', 'uplift', 'gain'], [qini[1:], uplift[1:], gain[1:]]):
+                table[f'{name}_lower'], table[f'{name}_upper'] = np.nanquantile(curve, [alpha / 2, 1 - alpha / 2], axis=0)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def uplift_summary(curves: pd.DataFrame) -> pd.DataFrame:
+    """AUUC, Qini coefficient and best policy of every model, from the output of uplift_curves."""
+    def summarize(c):
+        random_qini = c['fraction'] * c['qini'].iloc[-1]
+        best = c['gain'].idxmax()
+        return pd.Series({'auuc': c['uplift'].mean(), 'qini_coef': (c['qini'] - random_qini).mean(),
+                          'max_gain': c.loc[best, 'gain'], 'best_fraction': c.loc[best, 'fraction']})
+    return curves.groupby('model', sort=False)[['fraction', 'qini', 'uplift', 'gain']].apply(summarize)